@@ -3,6 +3,12 @@ from flask_restful import Resource
 
 from ..Utils.collections import MongoCollections
 from ..Utils.tables      import PostgresTables
+from ..Utils import rollups
+from ..Utils.cache import cached_response
+from ..Utils.versions import conditional_response
+
+# ===== Tablas de las que depende la respuesta (versión/ETag e invalidación de caché)
+DEPENDENCIES = [("postgresql", "users"), ("postgresql", "viewing_sessions")]
 
 class Portfolio_1(Resource):
     # =============== CONSTRUCTOR ===============
@@ -13,122 +19,68 @@ class Portfolio_1(Resource):
 
     # =============== METODOS PRIVADOS ===============
     def __completition_by_age(self):
-        ''' Completa los siguientes pasos:
-        1. Consulta el total de registros de 'viewing_sessions'.
-        2. Por cada rango de edades, ejecuta lo siguiente:
-            2.1 - Busca los usuarios que tengan ese rango de edad y guarda sus ids.
-            2.2 -  Con los ids de los usuarios, busca la cantidad de registros que tengan un 'completion_percentage' > 95.
-            2.3 - Hace una regla de 3 para sacar el porcentaje Vs el total de registros.
+        ''' Calcula, con una consulta a los rollups (tablas resumen mantenidas en cada inserción):
+        1. El total de registros de 'viewing_sessions' ('rollup_row_counts').
+        2. Por cada rango de edades, la cantidad de sesiones con 'completion_percentage' >= 95
+           de los usuarios en ese rango (suma de 'completed' en 'rollup_engagement').
+        3. Con eso hace una regla de 3 para sacar el porcentaje Vs el total de registros.
         '''
-        # === Prepara los rangos de edad
+        # === Prepara los rangos de edad (los rangos 46-55 y 55+ comparten los 55 años, igual que antes)
         ages = {
-            "18-25" : {
-                "index" : 0,
-                "range" : [i for i in range(18,25+1)]
-            },
-            "26-35" : {
-                "index" : 1,
-                "range" : [i for i in range(26,35+1)]
-            },
-            "36-45" : {
-                "index" : 2,
-                "range" : [i for i in range(36,45+1)]
-            },
-            "46-55" : {
-                "index" : 3,
-                "range" : [i for i in range(46,55+1)]
-            },
-            "55-99" : {
-                "index" : 4,
-                "range" : [i for i in range(55,99+1)]
-            },
+            "18-25" : (18, 25),
+            "26-35" : (26, 35),
+            "36-45" : (36, 45),
+            "46-55" : (46, 55),
+            "55+"   : (55, 99),
         }
-        values = []
 
-        # === Busca el total de registros de viewing_sessions
-        response, code = self.postgres.get(
-            table_name = 'viewing_sessions'
+        buckets = ",\n".join(
+            f'COALESCE(sum(completed) FILTER (WHERE age BETWEEN %s AND %s), 0)::bigint AS "{label}"'
+            for label in ages
         )
+        params = [limit for age_range in ages.values() for limit in age_range]
+
+        response, code = self.postgres.query(f"""
+            SELECT
+                (SELECT rows FROM rollup_row_counts WHERE source_table = 'viewing_sessions') AS total,
+                {buckets}
+            FROM rollup_engagement
+        """, params)
         if code != 200: raise Exception(f"1. Se encontró un error al consultar la info de la bd - ({code}): {response}")
-        else: total_registros = response['count']
-
-        for age_range,properties in ages.items():
-            # === Primero busca los ids de los usuarios en esos rangos
-            response, code = self.postgres.get(
-                table_name = 'users',
-                filters = {
-                    "age":properties['range']
-                }
-            )
-            if code != 200: raise Exception(f"2. Se encontró un error al consultar la info de la bd - ({code}): {response}")
-            else: response = response['data']
-
-            user_id_range = list(set(register['user_id'] for register in response))
-
-            # === Busca los completion_percentage > 95 de los user_id_range
-            response, code = self.postgres.get(
-                table_name = 'viewing_sessions',
-                filters = {
-                    "user_id":user_id_range,
-                    "completion_percentage":[95.0 + i*0.1 for i in range(60)]
-                }
-            )
-            if code != 200: raise Exception(f"3. Se encontró un error al consultar la info de la bd - ({code}): {response}")
-            else: response = response['count']
+        else: response = response['data'][0]
 
-            # === Guarda el porcentaje
-            porcentaje_completition_range = int((response * 100) / total_registros)
-            values.append(porcentaje_completition_range)
+        # === Guarda el porcentaje
+        total_registros = response['total']
+        values = [int((response[label] * 100) / total_registros) for label in ages]
 
-        
         return {
-            "labels": ["18-25", "26-35", "36-45", "46-55", "55+"],
+            "labels": list(ages.keys()),
             "values" : values
         }
 
     def __abandonment_by_country(self):
-        ''' 
+        ''' Calcula, con una consulta a los rollups, el porcentaje de sesiones con
+        'completion_percentage' < 30 (abandono) de los usuarios de cada país Vs el total de registros.
         '''
         paises = ["Mexico", "Colombia", "Argentina", "Chile"]
 
-        # === Busca el total de registros de viewing_sessions
-        response, code = self.postgres.get(
-            table_name = 'viewing_sessions'
+        columns = ",\n".join(
+            f'COALESCE(sum(abandoned) FILTER (WHERE country = %s), 0)::bigint AS "{pais}"'
+            for pais in paises
         )
-        if code != 200: raise Exception(f"4. Se encontró un error al consultar la info de la bd - ({code}): {response}")
-        else: total_registros = response['count']
-
-        # === Busca la información pais por país
-        values = []
-        for pais in paises:
 
-            # === Primero busca los ids de los usuarios en el pais
-            response, code = self.postgres.get(
-                table_name = 'users',
-                filters = {
-                    "country":pais
-                }
-            )
-            if code != 200: raise Exception(f"5. Se encontró un error al consultar la info de la bd - ({code}): {response}")
-            else: response = response['data']
-
-            user_id_range = list(set([register['user_id'] for register in response]))
-
-            # === Busca los completion_percentage < 30 de los user_id_range
-            response, code = self.postgres.get(
-                table_name = 'viewing_sessions',
-                filters = {
-                    "user_id":user_id_range,
-                    "completion_percentage":[i*0.1 for i in range(300)]
-                }
-            )
-            if code != 200: raise Exception(f"6. Se encontró un error al consultar la info de la bd - ({code}): {response}")
-            else:  response = response['count']
+        response, code = self.postgres.query(f"""
+            SELECT
+                (SELECT rows FROM rollup_row_counts WHERE source_table = 'viewing_sessions') AS total,
+                {columns}
+            FROM rollup_engagement
+        """, paises)
+        if code != 200: raise Exception(f"4. Se encontró un error al consultar la info de la bd - ({code}): {response}")
+        else: response = response['data'][0]
 
-            # === Guarda el porcentaje
-            porcentaje_completition_range = int((response * 100) / total_registros)
-            values.append(porcentaje_completition_range)
-        
+        # === Guarda el porcentaje
+        total_registros = response['total']
+        values = [int((response[pais] * 100) / total_registros) for pais in paises]
 
         return {
             "labels" : paises,
@@ -136,25 +88,24 @@ class Portfolio_1(Resource):
         }
     
     def __engagement_by_syscription(self):
-        '''
+        ''' Obtiene por tier de suscripción el número de usuarios y la suma de 'total_watch_time_hours'
+        del rollup 'rollup_subscription', y calcula el promedio de horas por usuario.
         '''
         tiers  = ["Basic", "Standard", "Premium"]
-        values = []
-
-        # === Busca los usuarios dependiendo su tier de suscripcion
-        for tier in tiers:
-            response, code = self.postgres.get(
-                table_name = 'users',
-                filters = {"subscription_type":tier}
-            )
-            if code != 200: raise Exception(f"7. Se encontró un error al consultar la info de la bd - ({code}): {response}")
-            
-            # === Obtiene el numero de usuarios en ese tier y el promedio de 'total_watch_time_hours'
-            total_users = response['count']
-            total_hours = sum([user['total_watch_time_hours'] for user in response['data']])
-            total_avrg  = int(total_hours / total_users)
-
-            values.append(total_avrg)
+
+        response, code = self.postgres.get(
+            table_name = 'rollup_subscription',
+            filters    = {"subscription_type":tiers},
+            fields     = ['subscription_type', 'users', 'watch_hours']
+        )
+        if code != 200: raise Exception(f"7. Se encontró un error al consultar la info de la bd - ({code}): {response}")
+        else: response = {row['subscription_type']: row for row in response['data']}
+
+        # === Obtiene el promedio de 'total_watch_time_hours' por tier
+        values = [
+            int(response[tier]['watch_hours'] / response[tier]['users'])
+            for tier in tiers
+        ]
 
         return {
             "labels": tiers,
@@ -164,6 +115,7 @@ class Portfolio_1(Resource):
     def __obtener_info_engagement(self):
         ''' 
         '''
+        rollups.ensure(self.postgres.get_connection, ['rollup_row_counts', 'rollup_engagement', 'rollup_subscription'])
         return {
             "completionByAge"          : self.__completition_by_age(),
             "abandonmentByCountry"     : self.__abandonment_by_country(),
@@ -173,6 +125,8 @@ class Portfolio_1(Resource):
     
     
     # =============== METODOS PUBLICOS ===============
+    @conditional_response(DEPENDENCIES)
+    @cached_response(DEPENDENCIES)
     def get(self):
         '''
         '''
@@ -1,76 +1,139 @@
 import traceback
+import numpy as np
 import pandas as pd
 from flask_restful import Resource
 from ..Utils.collections import MongoCollections
 from ..Utils.tables import PostgresTables
+from ..Utils.frames import frame_cache, load_frame
+from ..Utils import rollups
+from ..Utils.cache import cached_response
+from ..Utils.versions import conditional_response
+
+# ===== Dimensiones del cubo de salarios: todas las gráficas se derivan re-agrupando por un subconjunto
+CUBE_DIMENSIONS = ['work_year', 'period', 'experience_level', 'employee_residence', 'job_title', 'company_size', 'remote_ratio']
+
+# ===== Columnas del rollup 'rollup_tech_salaries' y su tipo compacto (textos repetidos como categorías)
+CUBE_SCHEMA = {
+    'work_year'          : 'Int16',
+    'experience_level'   : 'category',
+    'employee_residence' : 'category',
+    'job_title'          : 'category',
+    'company_size'       : 'category',
+    'remote_ratio'       : 'Int8',
+    'salary_sum'         : 'float64',
+    'salary_count'       : 'Int64',
+    'rows'               : 'Int64',
+}
+
+# ===== El rollup guarda -1 / '' en lugar de NULL en sus llaves; aquí se regresan a NULL
+CUBE_EXPRESSIONS = {
+    'work_year'          : "NULLIF(work_year, -1)",
+    'experience_level'   : "NULLIF(experience_level, '')",
+    'employee_residence' : "NULLIF(employee_residence, '')",
+    'job_title'          : "NULLIF(job_title, '')",
+    'company_size'       : "NULLIF(company_size, '')",
+    'remote_ratio'       : "NULLIF(remote_ratio, -1)",
+}
+
+# ===== Tablas de las que depende la respuesta (versión/ETag e invalidación de caché)
+DEPENDENCIES = [("postgresql", "tech_salaries")]
 
 class Proyecto_1(Resource):
     # =============== CONSTRUCTOR ===============
     def __init__(self):
         self.mongo = MongoCollections()
         self.postgres = PostgresTables()
-        
+
+        self.exp_level_map = {'EN': 'Entry Level', 'MI': 'Mid-Level', 'SE': 'Senior', 'EX': 'Executive'}
+        self.company_size_map = {'S': 'Startup (S)', 'M': 'Medium (M)', 'L': 'Large (L)'}
+        self.country_map = {
+            'US': 'United States', 'GB': 'United Kingdom', 'CA': 'Canada',
+            'DE': 'Germany', 'AU': 'Australia', 'NL': 'Netherlands', 'ES': 'Spain',
+            'FR': 'France'
+        }
+
+        self.cube = pd.DataFrame()
+
+    # =============== METODOS PRIVADOS ===============
+    def __prepare_cube(self):
+        ''' Obtiene el cubo al atender el GET (no al construir el recurso), así una respuesta
+        que ya está en caché no toca la bd '''
         try:
-            response, code = self.postgres.get(table_name='tech_salaries')
-            if code != 200:
-                raise Exception("Error al obtener datos de PostgreSQL")
-            
-            self.df = pd.DataFrame(response['data'])
-            self.df['salary_in_usd'] = pd.to_numeric(self.df['salary_in_usd'])
-            self.df['work_year'] = pd.to_numeric(self.df['work_year'])
-            self.df['period'] = self.df['work_year'].apply(lambda year: 'postAI' if year >= 2023 else 'preAI')
-            
-            self.exp_level_map = {'EN': 'Entry Level', 'MI': 'Mid-Level', 'SE': 'Senior', 'EX': 'Executive'}
-            self.company_size_map = {'S': 'Startup (S)', 'M': 'Medium (M)', 'L': 'Large (L)'}
-            self.country_map = {
-                'US': 'United States', 'GB': 'United Kingdom', 'CA': 'Canada',
-                'DE': 'Germany', 'AU': 'Australia', 'NL': 'Netherlands', 'ES': 'Spain',
-                'FR': 'France'
-            }
-            self.df_filtered = self.df[self.df['experience_level'].isin(self.exp_level_map.keys())]
-            self.df_filtered_geo = self.df[self.df['employee_residence'].isin(self.country_map.keys())]
+            # === El cubo sale del rollup 'rollup_tech_salaries' y se comparte entre requests del mismo worker
+            rollups.ensure(self.postgres.get_connection, ['rollup_tech_salaries'])
+            self.cube = frame_cache.get(('tech_salaries', 'cube'), self.__load_cube, self.__table_version)
 
         except Exception as e:
-            self.df = pd.DataFrame()
-            self.df_filtered = pd.DataFrame()
-            self.df_filtered_geo = pd.DataFrame()
+            self.cube = pd.DataFrame()
             print(f"ADVERTENCIA: No se pudieron cargar los datos. {e}")
 
-    # =============== METODOS PRIVADOS ===============
+    def __table_version(self):
+        ''' Versión del rollup de 'tech_salaries' (cambia con cada inserción o reconstrucción) '''
+        response, code = self.postgres.query(
+            "SELECT version FROM rollup_state WHERE name = %s", ['rollup_tech_salaries']
+        )
+        if code != 200:
+            raise Exception("Error al obtener la versión de 'rollup_tech_salaries' en PostgreSQL")
+        return tuple(row['version'] for row in response['data'])
+
+    def __load_cube(self):
+        ''' Carga el cubo ya agregado en la bd ('rollup_tech_salaries', una fila por combinación
+        de dimensiones con la suma y el conteo de 'salary_in_usd' y el total de registros) y le
+        agrega el periodo pre/post AI como categoría. Cualquier promedio o conteo de las gráficas
+        se obtiene re-agrupando este cubo pequeño.
+        '''
+        cube = load_frame(self.postgres, 'rollup_tech_salaries', CUBE_SCHEMA, CUBE_EXPRESSIONS)
+        if cube.empty:
+            return pd.DataFrame()
+
+        # === 'work_year' es Int16 nullable: los años NULL quedan en preAI (NA >= 2023 no es un booleano)
+        cube['period'] = pd.Categorical(np.where((cube['work_year'] >= 2023).fillna(False), 'postAI', 'preAI'))
+        return cube[CUBE_DIMENSIONS + ['salary_sum', 'salary_count', 'rows']]
+
+    def __average(self, cube, keys):
+        ''' Promedio de 'salary_in_usd' por las llaves indicadas (suma / conteo del cubo) '''
+        totals = cube.groupby(keys, observed=True)[['salary_sum', 'salary_count']].sum()
+        return totals['salary_sum'] / totals['salary_count']
+
     def _calculate_growth(self, pre_val, post_val):
         if pre_val > 0:
             return round(((post_val - pre_val) / pre_val) * 100, 1)
         return 0
 
+    def __period_comparison(self, cube, column, codes):
+        ''' Promedio pre/post AI por cada código de 'column', en el orden de 'codes' (solo los presentes) '''
+        avg_salary = self.__average(cube, ['period', column]).unstack().fillna(0)
+        present = [code for code in codes if code in avg_salary.columns]
+        avg_salary = avg_salary.reindex(index=['preAI', 'postAI'], columns=present, fill_value=0).fillna(0)
+
+        pre_ai_data = avg_salary.loc['preAI'].astype(int).tolist()
+        post_ai_data = avg_salary.loc['postAI'].astype(int).tolist()
+        growth_data = [self._calculate_growth(pre, post) for pre, post in zip(pre_ai_data, post_ai_data)]
+        return present, pre_ai_data, post_ai_data, growth_data
+
+    def __experience_cube(self):
+        return self.cube[self.cube['experience_level'].isin(self.exp_level_map.keys())]
+
     def __distributional(self):
-        if self.df_filtered.empty: return {}
-        avg_salary = self.df_filtered.groupby(['period', 'experience_level'])['salary_in_usd'].mean().unstack().fillna(0)
-        labels = [self.exp_level_map[level] for level in self.exp_level_map.keys() if level in avg_salary.columns]
-        pre_ai_data, post_ai_data, growth_data = [], [], []
-
-        for level_code in self.exp_level_map.keys():
-            if level_code in avg_salary.columns:
-                pre_val = int(avg_salary.loc['preAI', level_code]) if 'preAI' in avg_salary.index else 0
-                post_val = int(avg_salary.loc['postAI', level_code]) if 'postAI' in avg_salary.index else 0
-                pre_ai_data.append(pre_val)
-                post_ai_data.append(post_val)
-                growth_data.append(self._calculate_growth(pre_val, post_val))
+        cube = self.__experience_cube()
+        if cube.empty: return {}
+        codes, pre_ai_data, post_ai_data, growth_data = self.__period_comparison(cube, 'experience_level', self.exp_level_map.keys())
 
         return {
-            "labels": labels,
+            "labels": [self.exp_level_map[level] for level in codes],
             "preAI": {"label": "Pre-AI Era (2020-2022)", "data": pre_ai_data, "color": "#94a3b8"},
             "postAI": {"label": "Post-AI Era (2023-2025)", "data": post_ai_data, "color": "#3b82f6"},
             "growth": growth_data
         }
 
     def __work_modalities(self):
-        if self.df.empty: return {}
-        modality_counts = self.df.groupby(['work_year', 'remote_ratio']).size().unstack(fill_value=0)
+        if self.cube.empty: return {}
+        modality_counts = self.cube.groupby(['work_year', 'remote_ratio'], observed=True)['rows'].sum().unstack(fill_value=0)
         all_modalities = [0, 50, 100]
         modality_counts = modality_counts.reindex(columns=all_modalities, fill_value=0)
         total_per_year = modality_counts.sum(axis=1)
         modality_percentage = modality_counts.div(total_per_year, axis=0).fillna(0) * 100
-        years = sorted(self.df['work_year'].unique())
+        years = sorted(self.cube['work_year'].dropna().unique())
         return {
             "labels": [str(year) for year in years],
             "datasets": [
@@ -81,32 +144,23 @@ class Proyecto_1(Resource):
         }
 
     def __geographic(self):
-        if self.df_filtered_geo.empty: return {}
-        avg_salary = self.df_filtered_geo.groupby(['period', 'employee_residence'])['salary_in_usd'].mean().unstack().fillna(0)
-        labels = [self.country_map[code] for code in self.country_map.keys() if code in avg_salary.columns]
-        pre_ai_data, post_ai_data, growth_data = [], [], []
-
-        for country_code in self.country_map.keys():
-            if country_code in avg_salary.columns:
-                pre_val = int(avg_salary.loc['preAI', country_code]) if 'preAI' in avg_salary.index else 0
-                post_val = int(avg_salary.loc['postAI', country_code]) if 'postAI' in avg_salary.index else 0
-                pre_ai_data.append(pre_val)
-                post_ai_data.append(post_val)
-                growth_data.append(self._calculate_growth(pre_val, post_val))
+        cube = self.cube[self.cube['employee_residence'].isin(self.country_map.keys())]
+        if cube.empty: return {}
+        codes, pre_ai_data, post_ai_data, growth_data = self.__period_comparison(cube, 'employee_residence', self.country_map.keys())
 
         return {
-            "labels": labels,
+            "labels": [self.country_map[code] for code in codes],
             "preAI": {"label": "Pre-AI Era (2020-2022)", "data": pre_ai_data, "color": "#94a3b8"},
             "postAI": {"label": "Post-AI Era (2023-2025)", "data": post_ai_data, "color": "#3b82f6"},
             "growth": growth_data
         }
 
     def __roles(self):
-        if self.df.empty: return {}
+        if self.cube.empty: return {}
         target_roles = ["Data Scientist", "Machine Learning Engineer", "Data Engineer", "Data Analyst", "AI Scientist"]
-        df_roles = self.df[self.df['job_title'].isin(target_roles)]
+        cube = self.cube[self.cube['job_title'].isin(target_roles)]
         
-        if df_roles.empty:
+        if cube.empty:
             return {
                 "labels": target_roles,
                 "preAI": {"label": "Pre-AI Era (2020-2022)", "data": [0]*len(target_roles), "color": "#94a3b8"},
@@ -114,17 +168,7 @@ class Proyecto_1(Resource):
                 "growth": [0]*len(target_roles)
             }
         
-        avg_salary = df_roles.groupby(['period', 'job_title'])['salary_in_usd'].mean().unstack().fillna(0)
-        pre_ai_data, post_ai_data, growth_data, labels = [], [], [], []
-
-        for role in target_roles:
-            if role in avg_salary.columns:
-                labels.append(role)
-                pre_val = int(avg_salary.loc['preAI', role]) if 'preAI' in avg_salary.index else 0
-                post_val = int(avg_salary.loc['postAI', role]) if 'postAI' in avg_salary.index else 0
-                pre_ai_data.append(pre_val)
-                post_ai_data.append(post_val)
-                growth_data.append(self._calculate_growth(pre_val, post_val))
+        labels, pre_ai_data, post_ai_data, growth_data = self.__period_comparison(cube, 'job_title', target_roles)
 
         return {
             "labels": labels,
@@ -134,33 +178,29 @@ class Proyecto_1(Resource):
         }
 
     def __company(self):
-        if self.df.empty: return {}
-        df_post_ai = self.df[self.df['period'] == 'postAI']
-        avg_salary = df_post_ai.groupby('company_size')['salary_in_usd'].mean()
-        labels = [self.company_size_map[size] for size in self.company_size_map.keys() if size in avg_salary.index]
-        data = [int(avg_salary[size]) for size in self.company_size_map.keys() if size in avg_salary.index]
+        if self.cube.empty: return {}
+        avg_salary = self.__average(self.cube[self.cube['period'] == 'postAI'], 'company_size')
+        sizes = [size for size in self.company_size_map.keys() if size in avg_salary.index]
         return {
-            "labels": labels,
-            "data": data,
+            "labels": [self.company_size_map[size] for size in sizes],
+            "data": avg_salary.reindex(sizes).astype(int).tolist(),
             "colors": ["#ef4444", "#f59e0b", "#10b981"],
             "description": "Post-AI Era (2023-2025)"
         }
 
     def __temporal(self):
-        if self.df_filtered.empty: return {}
-        avg_salary = self.df_filtered.groupby(['work_year', 'experience_level'])['salary_in_usd'].mean().unstack().fillna(0)
-        years = sorted(self.df['work_year'].unique())
-        datasets = []
+        cube = self.__experience_cube()
+        if cube.empty: return {}
+        avg_salary = self.__average(cube, ['work_year', 'experience_level']).unstack().fillna(0)
+        years = sorted(self.cube['work_year'].dropna().unique())
         colors = {"EN": "#3498db", "MI": "#2ecc71", "SE": "#e74c3c", "EX": "#34495e"}
 
-        for level_code, level_name in self.exp_level_map.items():
-            if level_code in avg_salary.columns:
-                data = avg_salary[level_code].reindex(years, fill_value=0).round().astype(int).tolist()
-                datasets.append({
-                    "label": level_name,
-                    "data": data,
-                    "color": colors.get(level_code, "#9b59b6")
-                })
+        levels = [level for level in self.exp_level_map.keys() if level in avg_salary.columns]
+        avg_salary = avg_salary.reindex(index=years, columns=levels, fill_value=0).round().astype(int)
+        datasets = [
+            {"label": self.exp_level_map[level], "data": avg_salary[level].tolist(), "color": colors.get(level, "#9b59b6")}
+            for level in levels
+        ]
         
         return {
             "labels": [str(year) for year in years],
@@ -168,8 +208,11 @@ class Proyecto_1(Resource):
         }
 
     # =============== METODOS PUBLICOS ===============
+    @conditional_response(DEPENDENCIES)
+    @cached_response(DEPENDENCIES)
     def get(self):
-        if self.df.empty:
+        self.__prepare_cube()
+        if self.cube.empty:
              return {
                 "status": "error", "info": "No se pudieron cargar o procesar los datos.",
                 "detalles": "Verifique que la tabla 'tech_salaries' exista y contenga datos."
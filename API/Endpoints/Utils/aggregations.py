@@ -0,0 +1,402 @@
+import traceback, json, time
+from flask import current_app, request
+from flask_restful import Resource
+from contextlib import closing
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+from werkzeug.datastructures import ImmutableMultiDict
+
+from .cache import cached_response, arg_dependency
+from .filters import sql_condition, split_key, filters_to_args, FilterError, SQL_IDENTIFIER
+from .indexes import filter_usage
+
+class PostgresAggregations(Resource):
+    '''
+    Agregaciones GROUP BY calculadas dentro de PostgreSQL.
+    Solo viajan a la API las filas ya agregadas, no la tabla completa.
+    '''
+    FUNCTIONS = ("count", "sum", "avg", "min", "max", "percentile_cont")
+    RESERVED_KEYS = ("table", "group_by", "agg", "limit")
+
+    # =============== CONSTRUCTOR ===============
+    def __init__(self):
+        self.get_connection = current_app.config["get_postgres_connection"]
+
+    # =============== METODOS PRIVADOS ===============
+    def __create_args_from_params(self, table_name, group_by=None, aggregates=None, filters=None, limit=None):
+        """
+        Crea un ImmutableMultiDict desde parámetros de función
+
+        Args:
+            table_name (str): Nombre de la tabla
+            group_by (list): Columnas de agrupación
+            aggregates (list): Agregados como 'func:columna[:parametro]' o tuplas (func, columna[, parametro])
+            filters (dict): Filtros con el mismo lenguaje que PostgresTables
+            limit (int): Límite de grupos
+        """
+        args_list = [('table', table_name)]
+
+        for column in group_by or []:
+            args_list.append(('group_by', str(column)))
+
+        for aggregate in aggregates or []:
+            if isinstance(aggregate, (list, tuple)):
+                aggregate = ":".join(str(part) for part in aggregate)
+            args_list.append(('agg', aggregate))
+
+        if filters:
+            args_list.extend(filters_to_args(filters))
+
+        if limit:
+            args_list.append(('limit', str(limit)))
+
+        return ImmutableMultiDict(args_list)
+
+    def __compile_aggregate(self, spec):
+        """
+        Compila 'func:columna[:parametro]' a (expresion_sql, alias, parametros)
+        """
+        parts = spec.split(":")
+        function = parts[0].lower()
+        column = parts[1] if len(parts) > 1 and parts[1] else "*"
+
+        if function not in self.FUNCTIONS:
+            raise FilterError(f"Función de agregación no soportada: '{function}'. Usa {', '.join(self.FUNCTIONS)}")
+        if column != "*" and not SQL_IDENTIFIER.match(column):
+            raise FilterError(f"Nombre de columna no válido: '{column}'")
+        if column == "*" and function != "count":
+            raise FilterError(f"La función '{function}' necesita una columna")
+
+        if function == "count":
+            alias = "count" if column == "*" else f"count_{column}"
+            return f"count({column})", alias, []
+
+        if function == "percentile_cont":
+            try:
+                fraction = float(parts[2]) if len(parts) > 2 else 0.5
+            except ValueError:
+                raise FilterError(f"El percentil debe ser un número entre 0 y 1: '{parts[2]}'")
+            if not 0 <= fraction <= 1:
+                raise FilterError(f"El percentil debe estar entre 0 y 1: '{fraction}'")
+            alias = f"p{fraction * 100:g}_{column}"
+            return f"percentile_cont(%s) WITHIN GROUP (ORDER BY {column})", alias, [fraction]
+
+        return f"{function}({column})", f"{function}_{column}", []
+
+    def __parse_args(self, args_source):
+        """
+        Compila los argumentos a una sola sentencia SELECT ... GROUP BY parametrizada
+        """
+        table_name = args_source.get("table")
+
+        if not table_name:
+            return None, {
+                "status": "error",
+                "info": "Falta el parámetro 'table' en la consulta"
+            }, 400
+
+        if not SQL_IDENTIFIER.match(table_name):
+            return None, {
+                "status": "error",
+                "info": f"Nombre de tabla no válido: '{table_name}'"
+            }, 400
+
+        try:
+            # ===== Columnas de agrupación (se aceptan repetidas o separadas por coma)
+            group_by = [
+                column.strip()
+                for value in args_source.getlist("group_by")
+                for column in value.split(",") if column.strip()
+            ]
+            for column in group_by:
+                if not SQL_IDENTIFIER.match(column):
+                    raise FilterError(f"Nombre de columna no válido: '{column}'")
+
+            # ===== Funciones de agregación (count por defecto)
+            select_items = list(group_by)
+            select_params = []
+            for spec in args_source.getlist("agg") or ["count"]:
+                expression, alias, expression_params = self.__compile_aggregate(spec)
+                select_items.append(f'{expression} AS "{alias}"')
+                select_params.extend(expression_params)
+
+            # ===== Filtros WHERE
+            where_conditions = []
+            where_params = []
+            filter_columns = []
+            for key in dict.fromkeys(args_source.keys()):
+                if key in self.RESERVED_KEYS:
+                    continue
+                condition, condition_params = sql_condition(key, args_source.getlist(key))
+                where_conditions.append(condition)
+                where_params.extend(condition_params)
+                filter_columns.append(split_key(key)[0])
+
+        except FilterError as ex:
+            return None, {
+                "status": "error",
+                "info": f"Agregación no válida: {ex}"
+            }, 400
+
+        # ===== Armar la consulta
+        query = f"SELECT {', '.join(select_items)} FROM {table_name}"
+        if where_conditions:
+            query += " WHERE " + " AND ".join(where_conditions)
+        if group_by:
+            query += f" GROUP BY {', '.join(group_by)} ORDER BY {', '.join(group_by)}"
+
+        limit_value = args_source.get("limit")
+        if limit_value and limit_value.isdigit():
+            query += f" LIMIT {int(limit_value)}"
+
+        return (table_name, group_by, filter_columns, query, select_params + where_params), None, 200
+
+    def __execute_query(self, table_name, group_by, filter_columns, query, params):
+        """
+        Ejecuta la agregación en PostgreSQL
+        """
+        try:
+            started = time.perf_counter()
+            with closing(self.get_connection()) as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(query, params)
+                    columns = [desc[0] for desc in cursor.description]
+                    results = [dict(zip(columns, row)) for row in cursor.fetchall()]
+            filter_usage.record("postgresql", table_name, filter_columns, (time.perf_counter() - started) * 1000)
+
+            return {
+                "status": "fetched",
+                "database": "postgresql",
+                "table": table_name,
+                "group_by": group_by,
+                "count": len(results),
+                "data": results
+            }, 200
+
+        except Exception:
+            return {
+                "status": "error",
+                "info": traceback.format_exc().splitlines()
+            }, 500
+
+    # =============== METODOS HTTP ===============
+    @cached_response(arg_dependency("postgresql", "table"))
+    def get(self, table_name=None, group_by=None, aggregates=None, filters=None, limit=None):
+        """
+        Endpoint HTTP o método directo
+
+        Si se llama como endpoint HTTP: usa request.args
+            ej: ?table=users&group_by=country&agg=count&agg=avg:total_watch_time_hours&age__gte=18
+        Si se pasan parámetros: los usa directamente
+            ej: get('users', group_by=['country'], aggregates=['count', ('percentile_cont', 'age', 0.9)])
+        """
+        if table_name:
+            args_source = self.__create_args_from_params(table_name, group_by, aggregates, filters, limit)
+        else:
+            args_source = request.args
+
+        parsed_data, error_response, status_code = self.__parse_args(args_source)
+
+        if error_response:
+            return error_response, status_code
+
+        return self.__execute_query(*parsed_data)
+
+
+class MongoAggregations(Resource):
+    '''
+    Pipelines de agregación ejecutados dentro de mongod (ej. popularidad por género
+    o presupuesto contra rating de 'movies' / 'series'). Solo se aceptan etapas de
+    lectura de una lista permitida, sin JavaScript del lado del servidor.
+    '''
+    STAGES = ("$match", "$group", "$project", "$sort", "$limit", "$unwind")
+    UNWIND_FIELDS = ("genre", "episodes_per_season")
+    FORBIDDEN_OPERATORS = ("$where", "$function", "$accumulator")
+    MAX_STAGES = 20
+
+    # =============== CONSTRUCTOR ===============
+    def __init__(self):
+        self.db = current_app.config["mongo_db"]
+
+    # =============== METODOS PRIVADOS ===============
+    def __create_args_from_params(self, collection_name, pipeline=None, allow_disk_use=None, batch_size=None):
+        """
+        Crea un ImmutableMultiDict desde parámetros de función
+
+        Args:
+            collection_name (str): Nombre de la colección
+            pipeline (list): Etapas del pipeline, ej: [{'$unwind': '$genre'}, {'$group': {...}}]
+            allow_disk_use (bool): Permite a mongod usar archivos temporales en agrupaciones grandes
+            batch_size (int): Documentos por lote del cursor
+        """
+        args_list = [('collection', collection_name), ('pipeline', json.dumps(pipeline or []))]
+
+        if allow_disk_use is not None:
+            # Sin convertir a bool: __parse_args valida el valor igual que en GET
+            args_list.append(('allowDiskUse', str(allow_disk_use).lower() if isinstance(allow_disk_use, bool) else str(allow_disk_use)))
+        if batch_size:
+            args_list.append(('batchSize', str(batch_size)))
+
+        return ImmutableMultiDict(args_list)
+
+    def __check_operators(self, value):
+        """Revisa recursivamente que el pipeline no use operadores con JavaScript"""
+        if isinstance(value, dict):
+            for key, item in value.items():
+                if key in self.FORBIDDEN_OPERATORS:
+                    raise FilterError(f"Operador no permitido: '{key}'")
+                self.__check_operators(item)
+        elif isinstance(value, list):
+            for item in value:
+                self.__check_operators(item)
+
+    def __validate_stage(self, stage):
+        """Valida una etapa del pipeline contra la lista permitida"""
+        if not isinstance(stage, dict) or len(stage) != 1:
+            raise FilterError("Cada etapa debe ser un objeto con un solo operador, ej: {'$match': {...}}")
+
+        (operator, spec), = stage.items()
+        if operator not in self.STAGES:
+            raise FilterError(f"Etapa no soportada: '{operator}'. Usa {', '.join(self.STAGES)}")
+
+        if operator == "$limit" and (type(spec) is not int or spec <= 0):
+            raise FilterError("'$limit' debe ser un entero positivo")
+
+        if operator == "$unwind":
+            path = spec.get("path") if isinstance(spec, dict) else spec
+            if not isinstance(path, str) or path.lstrip("$") not in self.UNWIND_FIELDS:
+                raise FilterError(f"'$unwind' solo se permite sobre {', '.join('$' + field for field in self.UNWIND_FIELDS)}")
+
+        if operator in ("$match", "$group", "$project", "$sort") and not isinstance(spec, dict):
+            raise FilterError(f"'{operator}' debe ser un objeto")
+
+        self.__check_operators(spec)
+        return operator
+
+    def __parse_args(self, args_source):
+        """
+        Parsea y valida el pipeline desde request.args o desde ImmutableMultiDict
+        """
+        collection_name = args_source.get("collection")
+
+        if not collection_name:
+            return None, {
+                "status": "error",
+                "info": "Falta el parámetro 'collection' en la consulta"
+            }, 400
+
+        try:
+            pipeline = json.loads(args_source.get("pipeline") or "[]")
+            if not isinstance(pipeline, list):
+                raise FilterError("'pipeline' debe ser una lista de etapas")
+            if len(pipeline) > self.MAX_STAGES:
+                raise FilterError(f"El pipeline no puede tener más de {self.MAX_STAGES} etapas")
+            stages = [self.__validate_stage(stage) for stage in pipeline]
+
+            options = {}
+            allow_disk_use = (args_source.get("allowDiskUse") or "").lower()
+            if allow_disk_use:
+                if allow_disk_use not in ("true", "false"):
+                    raise FilterError("'allowDiskUse' debe ser 'true' o 'false'")
+                options["allowDiskUse"] = allow_disk_use == "true"
+
+            batch_size = args_source.get("batchSize")
+            if batch_size:
+                if not batch_size.isdigit() or int(batch_size) == 0:
+                    raise FilterError("'batchSize' debe ser un entero positivo")
+                options["batchSize"] = int(batch_size)
+
+        except json.JSONDecodeError as ex:
+            return None, {
+                "status": "error",
+                "info": f"'pipeline' no es JSON válido: {ex}"
+            }, 400
+
+        except FilterError as ex:
+            return None, {
+                "status": "error",
+                "info": f"Pipeline no válido: {ex}"
+            }, 400
+
+        return (collection_name, pipeline, stages, options), None, 200
+
+    def __execute_pipeline(self, collection_name, pipeline, stages, options):
+        """
+        Ejecuta el pipeline en MongoDB
+        """
+        try:
+            started = time.perf_counter()
+            results = list(self.db[collection_name].aggregate(pipeline, **options))
+            elapsed_ms = (time.perf_counter() - started) * 1000
+
+            # === Un $match al inicio es el que puede usar índices: cuenta para el reporte de /indexes
+            if stages and stages[0] == "$match":
+                filter_usage.record("mongodb", collection_name, [field for field in pipeline[0]["$match"] if not field.startswith("$")], elapsed_ms)
+
+            # Convertir ObjectId a string
+            for doc in results:
+                if isinstance(doc.get("_id"), ObjectId):
+                    doc["_id"] = str(doc["_id"])
+
+            return {
+                "status": "fetched",
+                "database": "mongodb",
+                "collection": collection_name,
+                "stages": stages,
+                "count": len(results),
+                "data": results
+            }, 200
+
+        except OperationFailure as ex:
+            # Pipeline bien formado pero rechazado por mongod (ej. acumulador inválido en $group)
+            return {
+                "status": "error",
+                "info": f"MongoDB rechazó el pipeline: {ex.details.get('errmsg', str(ex)) if ex.details else ex}"
+            }, 400
+
+        except Exception:
+            return {
+                "status": "error",
+                "info": traceback.format_exc().splitlines()
+            }, 500
+
+    # =============== METODOS HTTP ===============
+    @cached_response(arg_dependency("mongodb", "collection"))
+    def get(self, collection_name=None, pipeline=None, allow_disk_use=None, batch_size=None):
+        """
+        Endpoint HTTP o método directo
+
+        Si se llama como endpoint HTTP: usa request.args (el pipeline como JSON)
+            ej: ?collection=movies&pipeline=[{"$unwind":"$genre"},{"$group":{"_id":"$genre","views":{"$sum":"$views_count"}}}]
+        Si se pasan parámetros: los usa directamente
+            ej: get('movies', pipeline=[{'$unwind': '$genre'}, {'$group': {'_id': '$genre', 'count': {'$sum': 1}}}], allow_disk_use=True)
+        """
+        if collection_name:
+            args_source = self.__create_args_from_params(collection_name, pipeline, allow_disk_use, batch_size)
+        else:
+            args_source = request.args
+
+        parsed_data, error_response, status_code = self.__parse_args(args_source)
+
+        if error_response:
+            return error_response, status_code
+
+        return self.__execute_pipeline(*parsed_data)
+
+    def post(self):
+        """
+        Mismo pipeline que GET pero en el cuerpo JSON (pipelines largos que no caben en la URL):
+            {"collection": "series", "pipeline": [...], "allowDiskUse": true, "batchSize": 500}
+        Las respuestas de POST no se guardan en la caché.
+        """
+        payload = request.json or {}
+        args_source = self.__create_args_from_params(
+            payload.get("collection"), payload.get("pipeline"), payload.get("allowDiskUse"), payload.get("batchSize")
+        )
+
+        parsed_data, error_response, status_code = self.__parse_args(args_source)
+
+        if error_response:
+            return error_response, status_code
+
+        return self.__execute_pipeline(*parsed_data)
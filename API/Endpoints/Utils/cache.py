@@ -0,0 +1,163 @@
+import os, time, threading
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, request, g, has_request_context
+from .hooks import on_write
+from .versions import current_versions
+from .encoder import dumps
+
+class ResponseCache:
+    """
+    Caché LRU por proceso de las respuestas de los GET, limitada por bytes.
+
+    La llave es el endpoint más los argumentos del query string normalizados.
+    Cada entrada recuerda de qué tablas/colecciones depende y se elimina en
+    cuanto un POST/PATCH/DELETE de la API confirma cambios sobre alguna de
+    ellas. Las escrituras hechas en otro worker (cada worker tiene su propia
+    caché) se detectan con los contadores de versions.py, que entran en la llave.
+
+    Args:
+        max_bytes (int): Presupuesto de memoria; 0 desactiva la caché
+        ttl (float): Segundos máximos que vive una entrada
+    """
+    # =============== CONSTRUCTOR ===============
+    def __init__(self, max_bytes=32 * 1024 * 1024, ttl=60):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    # =============== METODOS PRIVADOS ===============
+    def __remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry["bytes"]
+
+    # =============== METODOS PUBLICOS ===============
+    def generation(self, dependencies):
+        """Foto de las versiones de las dependencias antes de calcular una respuesta"""
+        with self._lock:
+            return tuple(self._generations.get(dependency, 0) for dependency in dependencies)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and time.monotonic() - entry["stored_at"] < self.ttl:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return entry["value"]
+            if entry:
+                self.__remove(key)
+            self._stats["misses"] += 1
+            return None
+
+    def put(self, key, value, dependencies, generation):
+        """
+        Guarda la respuesta si ninguna dependencia cambió mientras se calculaba
+        y si cabe en el presupuesto (se desalojan las menos usadas)
+        """
+        size = len(dumps(value))
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if generation != tuple(self._generations.get(dependency, 0) for dependency in dependencies):
+                return
+            if key in self._entries:
+                self.__remove(key)
+            while self._entries and self._bytes + size > self.max_bytes:
+                self.__remove(next(iter(self._entries)))
+                self._stats["evictions"] += 1
+
+            self._entries[key] = {
+                "value": value,
+                "dependencies": set(dependencies),
+                "bytes": size,
+                "stored_at": time.monotonic()
+            }
+            self._bytes += size
+
+    def invalidate(self, backend, name):
+        """Elimina las respuestas que dependen de la tabla/colección"""
+        dependency = (backend, name)
+        with self._lock:
+            self._generations[dependency] = self._generations.get(dependency, 0) + 1
+            for key in [key for key, entry in self._entries.items() if dependency in entry["dependencies"]]:
+                self.__remove(key)
+                self._stats["invalidations"] += 1
+
+    def stats(self):
+        """Estadísticas de la caché para el endpoint /info"""
+        with self._lock:
+            return {
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                **self._stats
+            }
+
+
+# ===== Caché compartida por el proceso (cada worker de gunicorn tiene la suya)
+response_cache = ResponseCache(
+    max_bytes = int(os.getenv('RESPONSE_CACHE_MAX_BYTES', 32 * 1024 * 1024)),
+    ttl       = float(os.getenv('RESPONSE_CACHE_TTL', 60))
+)
+
+@on_write
+def _invalidate_responses(backend, name):
+    response_cache.invalidate(backend, name)
+
+
+def cached_response(dependencies):
+    """
+    Decorador para el GET de un Resource. Solo cachea las llamadas HTTP
+    (sin parámetros directos) que responden 200 con un diccionario; las
+    respuestas en streaming y los errores siempre se calculan.
+
+    Args:
+        dependencies (list | callable): Lista fija de (backend, nombre) de los que depende
+            la respuesta, o función que la obtiene de request.args (None para no cachear)
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if args or kwargs or not has_request_context() or not response_cache.max_bytes:
+                return method(self, *args, **kwargs)
+
+            depends_on = dependencies(request.args) if callable(dependencies) else dependencies
+            if not depends_on:
+                return method(self)
+
+            # === La versión de las dependencias entra en la llave: una escritura hecha en otro
+            #     worker cambia la versión y no se sirve una respuesta vieja. Con @conditional_response
+            #     ya viene en el ETag; si no, se leen los contadores (y se invalidan las entradas locales)
+            version = g.get("etag")
+            if version is None:
+                dependency_versions = current_versions(
+                    current_app.config["get_postgres_connection"], current_app.config["mongo_db"], depends_on
+                )
+                version = tuple(dependency_versions[dependency] for dependency in depends_on)
+            key = (
+                request.path,
+                tuple(sorted((k, tuple(request.args.getlist(k))) for k in request.args)),
+                version
+            )
+            value = response_cache.get(key)
+            if value is not None:
+                return value
+
+            generation = response_cache.generation(depends_on)
+            value = method(self)
+            if isinstance(value, tuple) and len(value) == 2 and value[1] == 200 and isinstance(value[0], dict):
+                response_cache.put(key, value, depends_on, generation)
+            return value
+        return wrapper
+    return decorator
+
+
+def arg_dependency(backend, arg):
+    """Dependencia tomada de un argumento del query string (ej. 'table' o 'collection')"""
+    return lambda args: [(backend, args[arg])] if args.get(arg) else None
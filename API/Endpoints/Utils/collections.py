@@ -1,9 +1,25 @@
-import traceback
+import traceback, time
+import bson
 from flask_restful import Resource
 from flask import current_app, request
-from pymongo import MongoClient
-from bson import ObjectId
+from pymongo import MongoClient, InsertOne, ReplaceOne, UpdateOne
+from pymongo.errors import BulkWriteError
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
 from werkzeug.datastructures import ImmutableMultiDict
+from .hooks import notify_write
+from . import versions
+from .cache import cached_response, arg_dependency
+from .filters import mongo_condition, merge_mongo_condition, filters_to_args, parse_fields, document_id, encode_cursor, decode_cursor, FilterError
+from .streaming import stream_response, STREAM_BATCH_SIZE, STREAM_FORMATS
+from .encoder import bson_to_json
+from .indexes import filter_usage
+
+# ===== Documentos por página en paginación keyset cuando no se indica 'limit'
+KEYSET_PAGE_SIZE = 1000
+
+# ===== Errores por documento que se detallan en la respuesta de una carga masiva (el total siempre se reporta)
+MAX_REPORTED_ERRORS = 1000
 
 class MongoCollections(Resource):
     # =============== CONSTRUCTOR ===============
@@ -11,32 +27,89 @@ class MongoCollections(Resource):
         self.db:MongoClient = current_app.config["mongo_db"]
 
     # =============== METODOS PRIVADOS ===============
-    def __create_args_from_params(self, collection_name, filters=None, limit=None, skip=None):
+    def __notify_write(self, collection_name):
+        """Sube la versión de la colección (ETag) y avisa a las cachés locales"""
+        versions.bump_mongo(self.db, collection_name)
+        notify_write("mongodb", collection_name)
+
+    def __bulk_operation(self, doc, mode, on_conflict):
+        """Operación de bulk_write para un documento según el modo de carga"""
+        if mode == "bulk" or "_id" not in doc:
+            return InsertOne(doc)
+        if on_conflict == "replace":
+            return ReplaceOne({"_id": doc["_id"]}, doc, upsert=True)
+        fields = {key: value for key, value in doc.items() if key != "_id"}
+        if on_conflict == "update":
+            return UpdateOne({"_id": doc["_id"]}, {"$set": fields}, upsert=True)
+        return UpdateOne({"_id": doc["_id"]}, {"$setOnInsert": fields}, upsert=True)
+
+    def __bulk_write(self, collection_name, documents, mode, on_conflict, batch_size):
+        """
+        Carga con bulk_write no ordenado, por lotes de batch_size documentos.
+        Sin orden, mongod aplica todo el lote aunque fallen algunos documentos
+        (ej. '_id' duplicado) y los errores se reportan por documento.
+
+        Returns:
+            dict: Conteos de la carga y lista de errores con el índice del documento en 'data'
+        """
+        collection = self.db[collection_name]
+        summary = {"inserted": 0, "upserted": 0, "matched": 0, "modified": 0, "failed": 0}
+        errors = []
+
+        for start in range(0, len(documents), batch_size):
+            batch = documents[start:start + batch_size]
+            operations = [self.__bulk_operation(doc, mode, on_conflict) for doc in batch]
+            try:
+                result = collection.bulk_write(operations, ordered=False).bulk_api_result
+            except BulkWriteError as ex:
+                result = ex.details
+                for error in result.get("writeErrors", []):
+                    summary["failed"] += 1
+                    if len(errors) < MAX_REPORTED_ERRORS:
+                        errors.append({
+                            "index": start + error["index"],
+                            "_id": batch[error["index"]].get("_id"),
+                            "code": error.get("code"),
+                            "info": error.get("errmsg")
+                        })
+
+            summary["inserted"] += result.get("nInserted", 0)
+            summary["upserted"] += result.get("nUpserted", 0)
+            summary["matched"] += result.get("nMatched", 0)
+            summary["modified"] += result.get("nModified", 0)
+
+        return summary, errors
+
+    def __create_args_from_params(self, collection_name, filters=None, limit=None, skip=None, fields=None, next_token=None, mode=None):
         """
         Crea un ImmutableMultiDict desde parámetros de función
         
         Args:
             collection_name (str): Nombre de la colección
             filters (dict): Filtros donde las claves pueden tener listas como valores
+                o diccionarios de operadores, ej: {'rating': {'gte': 8.5}}
             limit (int): Límite de documentos
             skip (int): Documentos a saltar
+            fields (list): Campos a regresar, ej: ['title', 'rating']
+            next_token (str): Paginación keyset; '' para la primera página o el 'next' de la respuesta anterior
+            mode (str): 'rows' (por defecto), 'count' o 'exists'
         """
         args_list = [('collection', collection_name)]
         
         if filters:
-            for key, value in filters.items():
-                if isinstance(value, list):
-                    # Múltiples valores para la misma clave
-                    for v in value:
-                        args_list.append((key, str(v)))
-                else:
-                    # Un solo valor
-                    args_list.append((key, str(value)))
+            args_list.extend(filters_to_args(filters))
+
+        for field in fields or []:
+            args_list.append(('fields', field))
         
         if limit:
             args_list.append(('limit', str(limit)))
         if skip:
             args_list.append(('skip', str(skip)))
+        if next_token is not None:
+            args_list.append(('next', next_token))
+        if mode:
+            args_list.append(('mode', mode))
         
         return ImmutableMultiDict(args_list)
 
@@ -60,6 +133,7 @@ class MongoCollections(Resource):
         query_filters = {}
         limit = None
         skip = None
+        options = {"format": "json", "projection": None, "next": None, "raw": False, "mode": "rows", "filter_columns": []}
         
         # Obtener todos los argumentos únicos (sin duplicados de keys)
         processed_keys = set()
@@ -70,89 +144,205 @@ class MongoCollections(Resource):
                 
             processed_keys.add(key)
             
-            if key in ["collection", "limit", "skip"]:
+            if key in ["collection", "limit", "skip", "format", "fields", "next", "raw", "mode"]:
                 if key == "limit":
                     limit_value = args_source.get("limit")
                     limit = int(limit_value) if limit_value and limit_value.isdigit() else None
                 elif key == "skip":
                     skip_value = args_source.get("skip")
                     skip = int(skip_value) if skip_value and skip_value.isdigit() else None
+                elif key == "format":
+                    options["format"] = args_source.get("format")
+                    if options["format"] not in ("json",) + STREAM_FORMATS:
+                        return None, {
+                            "status": "error",
+                            "info": f"Formato no soportado: '{options['format']}'. Usa 'json', 'ndjson' o 'json-stream'"
+                        }, 400
+                elif key == "raw":
+                    options["raw"] = (args_source.get("raw") or "").lower() == "true"
+                elif key == "mode":
+                    options["mode"] = args_source.get("mode")
+                    if options["mode"] not in ("rows", "count", "exists"):
+                        return None, {
+                            "status": "error",
+                            "info": f"Modo no soportado: '{options['mode']}'. Usa 'rows', 'count' o 'exists'"
+                        }, 400
+                elif key == "fields":
+                    try:
+                        fields = parse_fields(args_source.getlist("fields"), sql=False)
+                    except FilterError as ex:
+                        return None, {
+                            "status": "error",
+                            "info": f"Proyección no válida: {ex}"
+                        }, 400
+                    # '_id' solo se regresa si se pide explícitamente
+                    fields = ["_id" if field == "id" else field for field in fields]
+                    options["projection"] = {"_id": 0, **{field: 1 for field in fields}}
+                elif key == "next":
+                    try:
+                        options["next"] = decode_cursor(args_source.get("next")) if args_source.get("next") else ""
+                    except FilterError as ex:
+                        return None, {"status": "error", "info": str(ex)}, 400
                 continue
             
-            # Obtener todos los valores para esta clave
+            # Obtener todos los valores para esta clave y compilar el filtro
+            # (igualdad, $in u operadores como 'campo__gte' -> $gte)
             values = args_source.getlist(key)
             
-            if key == "_id" or key == "id":
-                # Manejo especial para IDs de MongoDB
+            try:
+                field, condition = mongo_condition(key, values)
+            except FilterError as ex:
+                return None, {
+                    "status": "error",
+                    "info": f"Filtro no válido '{key}': {ex}"
+                }, 400
+
+            merge_mongo_condition(query_filters, field, condition)
+            options["filter_columns"].append(field)
+
+        # ===== Paginación keyset: sustituye a skip y no aplica a los formatos en streaming
+        if options["next"] is not None and (skip or options["format"] in STREAM_FORMATS):
+            return None, {
+                "status": "error",
+                "info": "El parámetro 'next' no se puede combinar con 'skip' ni con formatos en streaming"
+            }, 400
+
+        # ===== Conteo / existencia: solo regresan un número o un booleano, sin documentos
+        if options["mode"] != "rows" and (options["format"] != "json" or options["next"] is not None):
+            return None, {
+                "status": "error",
+                "info": f"El modo '{options['mode']}' no se puede combinar con 'next' ni con formatos en streaming"
+            }, 400
+
+        # ===== BSON crudo: solo se escribe directo a la respuesta en los formatos en streaming
+        if options["raw"] and options["format"] not in STREAM_FORMATS:
+            return None, {
+                "status": "error",
+                "info": "El parámetro 'raw' solo aplica a los formatos 'ndjson' y 'json-stream'"
+            }, 400
+
+        return (collection_name, query_filters, limit, skip, options), None, 200
+
+    def __stream_documents(self, collection_name, cursor, output_format, raw=False):
+        """
+        Escribe los documentos conforme llegan los lotes del cursor,
+        sin armar la lista completa en memoria.
+        Con raw los documentos llegan como BSON crudo (RawBSONDocument) y se
+        convierten directo a Extended JSON relaxed, sin pasar por dicts de Python.
+        """
+        envelope = {"status": "fetched", "collection": collection_name}
+
+        if raw:
+            def raw_documents():
                 try:
-                    if len(values) == 1:
-                        # Un solo ID
-                        query_filters["_id"] = ObjectId(values[0])
-                    else:
-                        # Múltiples IDs - usar operador $in
-                        object_ids = [ObjectId(value) for value in values]
-                        query_filters["_id"] = {"$in": object_ids}
-                except Exception as ex:
-                    return None, {
-                        "status": "error", 
-                        "info": f"Uno o más IDs proporcionados no son válidos: {values}",
-                        "error": f"{ex}"
-                    }, 400
-            else:
-                # Para otros campos
-                if len(values) == 1:
-                    # Un solo valor - conversión de tipo básica
-                    value = values[0]
-                    if value.lower() == "true":
-                        query_filters[key] = True
-                    elif value.lower() == "false":
-                        query_filters[key] = False
-                    elif value.isdigit():
-                        query_filters[key] = int(value)
-                    else:
-                        query_filters[key] = value
-                else:
-                    # Múltiples valores - usar operador $in con conversión de tipos
-                    converted_values = []
-                    for value in values:
-                        if value.lower() == "true":
-                            converted_values.append(True)
-                        elif value.lower() == "false":
-                            converted_values.append(False)
-                        elif value.isdigit():
-                            converted_values.append(int(value))
-                        else:
-                            converted_values.append(value)
-                    query_filters[key] = {"$in": converted_values}
-
-        return (collection_name, query_filters, limit, skip), None, 200
-
-    def __execute_query(self, collection_name, query_filters, limit, skip):
+                    for doc in cursor.batch_size(STREAM_BATCH_SIZE):
+                        yield doc.raw
+                finally:
+                    cursor.close()
+
+            return stream_response(raw_documents(), output_format, envelope=envelope, encode=bson_to_json)
+
+        def documents():
+            try:
+                for doc in cursor.batch_size(STREAM_BATCH_SIZE):
+                    if "_id" in doc:
+                        doc["_id"] = str(doc["_id"])
+                    yield doc
+            finally:
+                cursor.close()
+
+        return stream_response(documents(), output_format, envelope=envelope)
+
+    def __count_documents(self, collection_name, query_filters, limit, skip, options):
+        """
+        Conteo / existencia sin leer documentos. Sin filtros ni paginación el total
+        sale de los metadatos de la colección (estimated_document_count, sin recorrerla).
+        """
+        collection = self.db[collection_name]
+        paging = {key: value for key, value in (("skip", skip), ("limit", limit)) if value}
+        estimated = False
+
+        started = time.perf_counter()
+        if options["mode"] == "exists":
+            value = collection.count_documents(query_filters, **{**paging, "limit": 1}) > 0
+        elif not query_filters and not paging:
+            value = collection.estimated_document_count()
+            estimated = True
+        else:
+            value = collection.count_documents(query_filters, **paging)
+        filter_usage.record("mongodb", collection_name, options["filter_columns"], (time.perf_counter() - started) * 1000)
+
+        response = {
+            "status": "fetched",
+            "collection": collection_name,
+            "mode": options["mode"],
+            options["mode"]: value
+        }
+        if options["mode"] == "count":
+            response["estimated"] = estimated
+        return response, 200
+
+    def __execute_query(self, collection_name, query_filters, limit, skip, options):
         """
         Ejecuta la consulta en MongoDB
         """
         try:
+            # ===== Conteo / existencia
+            if options["mode"] != "rows":
+                return self.__count_documents(collection_name, query_filters, limit, skip, options)
+
             # ===== Ejecutar consulta
             collection = self.db[collection_name]
-            cursor = collection.find(query_filters)
+            if options["raw"]:
+                collection = collection.with_options(codec_options=CodecOptions(document_class=RawBSONDocument))
+            keyset = options["next"] is not None
+            projection = options["projection"]
+
+            # ===== Paginación keyset: ordena por '_id' y continúa después de la última llave
+            if keyset:
+                if options["next"] != "":
+                    query_filters = dict(query_filters)
+                    merge_mongo_condition(query_filters, "_id", {"$gt": options["next"]})
+                if projection and not projection.get("_id"):
+                    projection = {**projection, "_id": 1}
+                limit = limit or KEYSET_PAGE_SIZE
+
+            cursor = collection.find(query_filters, projection)
+            if keyset:
+                cursor = cursor.sort("_id", 1)
             
             if skip:
                 cursor = cursor.skip(skip)
             if limit:
                 cursor = cursor.limit(limit)
+
+            # ===== Salida en streaming (NDJSON / arreglo JSON en pedazos)
+            # (en streaming solo se cuenta el uso del filtro, la latencia la marca el cliente)
+            if options["format"] in STREAM_FORMATS:
+                filter_usage.record("mongodb", collection_name, options["filter_columns"])
+                return self.__stream_documents(collection_name, cursor, options["format"], options["raw"])
                 
+            started = time.perf_counter()
             documents = list(cursor)
+            filter_usage.record("mongodb", collection_name, options["filter_columns"], (time.perf_counter() - started) * 1000)
+            # Última llave con su tipo original (ObjectId, texto, número) para el token
+            last_id = documents[-1]["_id"] if keyset and documents else None
 
             # Convertir ObjectId a string
             for doc in documents:
-                doc["_id"] = str(doc["_id"])
+                if "_id" in doc:
+                    doc["_id"] = str(doc["_id"])
 
-            return {
+            response = {
                 "status": "fetched",
                 "collection": collection_name,
                 "count": len(documents),
                 "data": documents
-            }, 200
+            }
+            if keyset:
+                # Página incompleta = ya no hay más documentos
+                response["next"] = encode_cursor(last_id) if len(documents) == limit else None
+            return response, 200
 
         except Exception:
             return {
@@ -160,21 +350,24 @@ class MongoCollections(Resource):
                 "info": traceback.format_exc().splitlines()
             }, 500
 
-    def __query_collection(self, collection_name, filters=None, limit=None, skip=None):
+    def __query_collection(self, collection_name, filters=None, limit=None, skip=None, fields=None, next_token=None, mode=None):
         """
         Método para consultar colecciones directamente desde código
         
         Args:
             collection_name (str): Nombre de la colección
-            filters (dict): Filtros, ej: {'status': 'active', 'type': ['A', 'B']}
+            filters (dict): Filtros, ej: {'status': 'active', 'type': ['A', 'B'], 'year': {'between': [2000, 2010]}}
             limit (int): Límite de documentos
             skip (int): Documentos a saltar
+            fields (list): Campos a regresar (proyección)
+            next_token (str): Paginación keyset ('' = primera página)
+            mode (str): 'count' o 'exists' para no transferir documentos
         
         Returns:
             tuple: (response_data, status_code)
         """
         # Crear args simulados
-        mock_args = self.__create_args_from_params(collection_name, filters, limit, skip)
+        mock_args = self.__create_args_from_params(collection_name, filters, limit, skip, fields, next_token, mode)
         
         # Parsear argumentos
         parsed_data, error_response, status_code = self.__parse_args(mock_args)
@@ -182,15 +375,14 @@ class MongoCollections(Resource):
         if error_response:
             return error_response, status_code
         
-        collection_name, query_filters, limit, skip = parsed_data
-        
         # Ejecutar consulta
-        return self.__execute_query(collection_name, query_filters, limit, skip)
+        return self.__execute_query(*parsed_data)
 
     
     
     # =============== METODOS HTTP ===============
-    def get(self, collection_name=None, filters=None, limit=None, skip=None):
+    @cached_response(arg_dependency("mongodb", "collection"))
+    def get(self, collection_name=None, filters=None, limit=None, skip=None, fields=None, next_token=None, mode=None):
         """
         Endpoint HTTP o método directo
         
@@ -199,7 +391,7 @@ class MongoCollections(Resource):
         """
         if collection_name:
             # Llamada directa con parámetros
-            return self.__query_collection(collection_name, filters, limit, skip)
+            return self.__query_collection(collection_name, filters, limit, skip, fields, next_token, mode)
         else:
             # Llamada como endpoint HTTP
             parsed_data, error_response, status_code = self.__parse_args(request.args)
@@ -207,10 +399,8 @@ class MongoCollections(Resource):
             if error_response:
                 return error_response, status_code
             
-            collection_name, query_filters, limit, skip = parsed_data
-            
             # Ejecutar consulta
-            return self.__execute_query(collection_name, query_filters, limit, skip)
+            return self.__execute_query(*parsed_data)
     
     def post(self):
         try:
@@ -218,6 +408,9 @@ class MongoCollections(Resource):
             payload = request.json
             collection_name = payload.get("collection")
             data = payload.get("data")
+            mode = payload.get("mode", "insert")
+            batch_size = payload.get("batch_size", 1000)
+            on_conflict = payload.get("on_conflict", "replace")
         
             # ===== Validaciones
             if not collection_name:
@@ -231,11 +424,80 @@ class MongoCollections(Resource):
                     "status": "error",
                     "info": "Valida que se encuentre 'data' en el payload"
                 }, 400
+
+            if mode not in ("insert", "bulk", "upsert"):
+                return {
+                    "status": "error",
+                    "info": "Valida que 'mode' sea 'insert', 'bulk' o 'upsert'"
+                }, 400
+
+            # ===== Carga masiva: bulk_write no ordenado con errores por documento
+            if mode in ("bulk", "upsert"):
+                if not isinstance(batch_size, int) or isinstance(batch_size, bool) or batch_size < 1:
+                    return {
+                        "status": "error",
+                        "info": "Valida que 'batch_size' sea un entero positivo"
+                    }, 400
+
+                if on_conflict not in ("replace", "update", "nothing"):
+                    return {
+                        "status": "error",
+                        "info": "Valida que 'on_conflict' sea 'replace', 'update' o 'nothing'"
+                    }, 400
+
+                documents = [data] if isinstance(data, dict) else data
+                if not isinstance(documents, list) or not all(isinstance(item, dict) for item in documents):
+                    return {
+                        "status": "error",
+                        "info": "Valida que 'data' sea un documento o una lista de documentos"
+                    }, 400
+
+                duplicates = 0
+                if mode == "upsert":
+                    # === Mismo '_id' que el GET: el texto de un ObjectId vuelve a ser ObjectId
+                    for doc in documents:
+                        if "_id" in doc:
+                            doc["_id"] = document_id(doc["_id"])
+
+                    # === Sin orden no se sabe cuál de dos documentos con el mismo '_id' queda: gana el último.
+                    #     La llave es el '_id' en BSON: también sirve para '_id' compuestos (objetos / listas)
+                    keys = [bson.encode({"_id": doc["_id"]}) if "_id" in doc else None for doc in documents]
+                    last_by_id = {key: index for index, key in enumerate(keys) if key is not None}
+                    unique = [
+                        doc for index, (doc, key) in enumerate(zip(documents, keys))
+                        if key is None or last_by_id[key] == index
+                    ]
+                    duplicates = len(documents) - len(unique)
+                    documents = unique
+
+                summary, errors = self.__bulk_write(collection_name, documents, mode, on_conflict, batch_size)
+                written = summary["inserted"] + summary["upserted"] + summary["modified"]
+                if written:
+                    self.__notify_write(collection_name)
+
+                response = {
+                    "status": "partial" if errors else "created",
+                    "database": "mongodb",
+                    "collection": collection_name,
+                    "action": "upserted" if mode == "upsert" else "inserted",
+                    "info": f"{written} documentos escritos en la colección '{collection_name}', {summary['failed']} con error",
+                    "count": len(documents),
+                    **summary,
+                    "duplicates": duplicates,
+                    "errors": errors
+                }
+                if summary["failed"] and not written and not summary["matched"]:
+                    response["status"] = "error"
+                    return response, 409
+                if errors:
+                    return response, 207
+                return response, 201 if summary["inserted"] + summary["upserted"] else 200
             
             # ===== Normalizar data a lista de documentos
             if isinstance(data, dict):
                 # Si es un solo documento, usar insert_one
                 result = self.db[collection_name].insert_one(data)
+                self.__notify_write(collection_name)
                 
                 return {
                     "status": "created",
@@ -264,6 +526,7 @@ class MongoCollections(Resource):
                 
                 # Usar insert_many para múltiples documentos
                 result = self.db[collection_name].insert_many(data)
+                self.__notify_write(collection_name)
                 
                 return {
                     "status": "created",
@@ -318,7 +581,7 @@ class MongoCollections(Resource):
 
             # ===== Consulta en BD
             result = self.db[collection_name].update_one(
-                {"_id": ObjectId(doc_id)},
+                {"_id": document_id(doc_id)},
                 {"$set": update_data}
             )
             
@@ -327,6 +590,7 @@ class MongoCollections(Resource):
                     "status": "error",
                     "info": "No se encontró el documento con el id especificado"
                 }, 404
+            self.__notify_write(collection_name)
             
             # ===== Confirmación
             return {
@@ -364,6 +628,8 @@ class MongoCollections(Resource):
             # ===== Eliminar toda la colección si no hay ID
             if not doc_id:
                 result = collection.delete_many({})
+                if result.deleted_count:
+                    self.__notify_write(collection_name)
                 return {
                     "status": "deleted_all",
                     
@@ -372,13 +638,14 @@ class MongoCollections(Resource):
                 }, 200
 
             # ===== Eliminar un solo documento por ID
-            result = collection.delete_one({"_id": ObjectId(doc_id)})
+            result = collection.delete_one({"_id": document_id(doc_id)})
             
             if result.deleted_count == 0:
                 return {
                     "status": "error",
                     "info": "No se encontró el documento con el id especificado"
                 }, 404
+            self.__notify_write(collection_name)
 
             # ===== Confirmación de eliminación individual
             return {
@@ -0,0 +1,272 @@
+import io, queue, threading
+from flask import Response
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow viene en requirements.txt; sin él format=arrow|parquet responde 501
+    pa = None
+
+# ===== Formatos por columnas de GET /postgres
+COLUMNAR_FORMATS = ("arrow", "parquet", "csv")
+
+# ===== Bytes de CSV por pedazo enviado / por lote que convierte Arrow (RecordBatch o row group)
+COPY_CHUNK_SIZE = 64 * 1024
+COLUMNAR_BLOCK_SIZE = 4 * 1024 * 1024
+
+_MIMETYPES = {
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+    "csv": "text/csv",
+}
+
+
+class ColumnarUnavailable(Exception):
+    """El formato pedido necesita pyarrow y no está instalado (el endpoint responde 501)"""
+
+
+# =============== COPY EN STREAMING ===============
+class _CopyStream:
+    """
+    COPY (query) TO STDOUT en CSV desde un hilo aparte. PostgreSQL arma el CSV;
+    los pedazos pasan por una cola acotada, así se envían conforme se producen
+    y la memoria se mantiene fija aunque la tabla sea grande.
+
+    close() detiene el hilo desde cualquier punto (incluso si nunca se leyó
+    nada); hasta que regresa, la conexión no se puede devolver al pool.
+    """
+    _DONE = object()
+
+    def __init__(self, cursor, query):
+        self._cursor = cursor
+        self._chunks = queue.Queue(maxsize=16)
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self.__copy, args=(query,), daemon=True)
+        self._thread.start()
+
+    # =============== METODOS PRIVADOS ===============
+    def __put(self, item):
+        """Encola sin bloquearse para siempre si ya nadie va a leer"""
+        while not self._stopped.is_set():
+            try:
+                self._chunks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+        raise IOError("El cliente cerró la conexión")
+
+    def __copy(self, query):
+        put = self.__put
+
+        class Writer:
+            """copy_expert escribe fila por fila; se agrupan en pedazos de COPY_CHUNK_SIZE"""
+            def __init__(self):
+                self.buffer = []
+                self.size = 0
+
+            def write(self, data):
+                self.buffer.append(data if isinstance(data, bytes) else data.encode())
+                self.size += len(data)
+                if self.size >= COPY_CHUNK_SIZE:
+                    self.flush()
+
+            def flush(self):
+                if self.buffer:
+                    put(b"".join(self.buffer))
+                    self.buffer, self.size = [], 0
+
+        try:
+            writer = Writer()
+            self._cursor.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER)", writer)
+            writer.flush()
+            self.__put(self._DONE)
+        except Exception as ex:
+            if not self._stopped.is_set():
+                try:
+                    self.__put(ex)
+                except IOError:
+                    pass
+
+    # =============== METODOS PUBLICOS ===============
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        while True:
+            if self._stopped.is_set():
+                raise StopIteration
+            try:
+                chunk = self._chunks.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if chunk is self._DONE:
+                self._stopped.set()
+                raise StopIteration
+            if isinstance(chunk, Exception):
+                self._stopped.set()
+                raise chunk
+            return chunk
+
+    def close(self):
+        """Detiene el COPY (cancelando la consulta si sigue en el servidor) y espera al hilo"""
+        self._stopped.set()
+        if self._thread.is_alive():
+            self._cursor.connection.cancel()
+        self._thread.join()
+
+
+class _ChunkReader(io.RawIOBase):
+    """Archivo de solo lectura sobre un generador de pedazos de bytes (entrada del lector CSV de Arrow)"""
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self._pending = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._pending:
+            self._pending = next(self._chunks, b"")
+            if not self._pending:
+                return 0
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+
+class _Drain(io.RawIOBase):
+    """Destino de escritura que entrega lo escrito por pedazos (sin acumular el archivo)"""
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def take(self):
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+# =============== ARROW / PARQUET ===============
+def _arrow_type(type_code):
+    """Tipo de Arrow a partir del OID de PostgreSQL de la columna (texto para el resto)"""
+    return {
+        16: pa.bool_(),
+        20: pa.int64(), 21: pa.int16(), 23: pa.int32(),
+        700: pa.float32(), 701: pa.float64(), 1700: pa.float64(),
+        1082: pa.date32(),
+        1114: pa.timestamp("us"), 1184: pa.timestamp("us", tz="UTC"),
+    }.get(type_code, pa.string())
+
+
+def _arrow_schema(cursor, query):
+    """Esquema de Arrow con los tipos de las columnas que regresa la consulta (sin leer filas)"""
+    cursor.execute(f"SELECT * FROM ({query}) AS q LIMIT 0")
+    return pa.schema([(desc[0], _arrow_type(desc[1])) for desc in cursor.description])
+
+
+def _arrow_chunks(copy, schema, output_format):
+    """
+    Convierte el CSV de COPY a lotes de Arrow con el lector CSV nativo de pyarrow
+    (tipos tomados de las columnas de PostgreSQL), sin objetos de Python por fila
+    """
+    reader = pa_csv.open_csv(
+        _ChunkReader(copy),
+        read_options=pa_csv.ReadOptions(block_size=COLUMNAR_BLOCK_SIZE),
+        parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+        convert_options=pa_csv.ConvertOptions(
+            column_types=schema,
+            # COPY escribe NULL como campo vacío y el texto vacío como ""
+            null_values=[""],
+            strings_can_be_null=True,
+            quoted_strings_can_be_null=False,
+            true_values=["t"],
+            false_values=["f"]
+        )
+    )
+
+    sink = _Drain()
+    if output_format == "arrow":
+        writer = pa.ipc.new_stream(sink, schema)
+    else:
+        writer = pq.ParquetWriter(sink, schema, compression="snappy")
+
+    try:
+        for batch in reader:
+            if output_format == "arrow":
+                writer.write_batch(batch)
+            else:
+                writer.write_table(pa.Table.from_batches([batch], schema=schema))
+            yield sink.take()
+    finally:
+        writer.close()
+    yield sink.take()
+
+
+def columnar_response(get_connection, query, params, output_format, filename):
+    """
+    Respuesta en streaming con los datos por columnas
+
+    Args:
+        get_connection (callable): Conexión de PostgreSQL (se devuelve al terminar)
+        query (str): SELECT parametrizado
+        params (list): Parámetros del SELECT
+        output_format (str): 'arrow' (Arrow IPC stream), 'parquet' o 'csv'
+        filename (str): Nombre sugerido para la descarga (sin extensión)
+    """
+    if output_format in ("arrow", "parquet") and pa is None:
+        raise ColumnarUnavailable(f"El formato '{output_format}' necesita el paquete 'pyarrow'")
+
+    conn = get_connection()
+    cursor, copy, chunks = None, None, None
+    released = False
+
+    def release():
+        nonlocal released
+        if released:
+            return
+        released = True
+        try:
+            if chunks is not None and chunks is not copy:
+                chunks.close()
+            if copy is not None:
+                copy.close()
+            if cursor is not None:
+                cursor.close()
+        finally:
+            conn.close()
+
+    try:
+        cursor = conn.cursor()
+        # COPY no acepta parámetros: se incrustan ya escapados por psycopg2
+        query = cursor.mogrify(query, params).decode()
+        schema = _arrow_schema(cursor, query) if output_format != "csv" else None
+        copy = _CopyStream(cursor, query)
+        chunks = copy if output_format == "csv" else _arrow_chunks(copy, schema, output_format)
+        # === El primer pedazo se lee antes de responder: una consulta o tabla inválida
+        #     termina en una respuesta JSON de error y no en un cuerpo truncado con 200
+        first = next(chunks, b"")
+    except Exception:
+        release()
+        raise
+
+    def body():
+        try:
+            yield first
+            yield from chunks
+        finally:
+            release()
+
+    extension = {"arrow": "arrows"}.get(output_format, output_format)
+    response = Response(body(), mimetype=_MIMETYPES[output_format], headers={
+        "Content-Disposition": f'attachment; filename="{filename}.{extension}"'
+    })
+    # === También al cerrar la respuesta aunque el cuerpo no se haya leído (HEAD, cliente que se fue)
+    response.call_on_close(release)
+    return response
@@ -0,0 +1,196 @@
+import os, zlib, threading
+from collections import OrderedDict
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional: sin él no se ofrece 'br'
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # zstandard es opcional: sin él no se ofrece 'zstd'
+    zstandard = None
+
+# ===== Configuración (los niveles de cada algoritmo tienen rangos distintos)
+COMPRESSION_ENABLED = os.getenv('COMPRESSION_ENABLED', 'true').lower() == 'true'
+COMPRESSION_MIN_BYTES = int(os.getenv('COMPRESSION_MIN_BYTES', 1024))
+COMPRESSION_LEVELS = {
+    "zstd": int(os.getenv('COMPRESSION_ZSTD_LEVEL', 3)),    # 1-22
+    "br":   int(os.getenv('COMPRESSION_BROTLI_LEVEL', 4)),  # 0-11
+    "gzip": int(os.getenv('COMPRESSION_GZIP_LEVEL', 6)),    # 1-9
+}
+
+# ===== Codificaciones disponibles, en orden de preferencia cuando el cliente no distingue
+ENCODINGS = tuple(
+    encoding for encoding, available in (("zstd", zstandard), ("br", brotli), ("gzip", zlib)) if available
+)
+
+# ===== Bytes sin comprimir que se acumulan antes de vaciar un bloque en las respuestas en streaming
+#       (un flush por fila produce bloques diminutos que casi no comprimen)
+STREAM_FLUSH_BYTES = 64 * 1024
+
+# ===== Cómo salió la respuesta 200 de cada ETag (tipo comprimible, comprimida), para que el 304
+#       lleve el mismo ETag y el mismo Vary (las respuestas chicas conservan el ETag sin sufijo)
+COMPRESSED_ETAGS_SIZE = 1024
+_compressed_etags = OrderedDict()
+_compressed_etags_lock = threading.Lock()
+
+# ===== Tipos que vale la pena comprimir (Parquet ya viene comprimido)
+_COMPRESSIBLE = (
+    "application/json", "application/x-ndjson", "application/vnd.apache.arrow.stream", "text/"
+)
+
+
+# =============== COMPRESORES ===============
+class _Compressor:
+    """
+    Compresor incremental: `compress` solo alimenta al compresor y `flush` vacía
+    un bloque con un flush de sincronización, así el cliente puede descomprimir
+    lo recibido sin esperar el final del cuerpo
+    """
+    def __init__(self, encoding):
+        level = COMPRESSION_LEVELS[encoding]
+        self.encoding = encoding
+        if encoding == "gzip":
+            self._engine = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        elif encoding == "br":
+            self._engine = brotli.Compressor(quality=level)
+        else:
+            self._engine = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, chunk):
+        if self.encoding == "br":
+            return self._engine.process(chunk)
+        return self._engine.compress(chunk)
+
+    def flush(self):
+        if self.encoding == "gzip":
+            return self._engine.flush(zlib.Z_SYNC_FLUSH)
+        if self.encoding == "br":
+            return self._engine.flush()
+        return self._engine.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        if self.encoding == "gzip":
+            return self._engine.flush()
+        if self.encoding == "br":
+            return self._engine.finish()
+        return self._engine.flush()
+
+    def compress_all(self, data):
+        """Cuerpo completo en una sola llamada (sin flush intermedio)"""
+        if self.encoding == "gzip":
+            return self._engine.compress(data) + self._engine.flush()
+        if self.encoding == "br":
+            return self._engine.process(data) + self._engine.finish()
+        return self._engine.compress(data) + self._engine.flush()
+
+
+def _negotiate():
+    """Codificación aceptada por el cliente con mayor calidad (None si no acepta ninguna)"""
+    accepted = request.accept_encodings
+    best, best_quality = None, 0
+    for encoding in ENCODINGS:
+        quality = accepted.quality(encoding)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def etag_variants(etag):
+    """ETags válidos para una misma representación (sin comprimir y con cada codificación)"""
+    return [etag] + [f"{etag}-{encoding}" for encoding in ENCODINGS]
+
+
+def _remember_etag(etag, compressible, compressed):
+    with _compressed_etags_lock:
+        _compressed_etags[etag] = (compressible, compressed)
+        _compressed_etags.move_to_end(etag)
+        while len(_compressed_etags) > COMPRESSED_ETAGS_SIZE:
+            _compressed_etags.popitem(last=False)
+
+
+def _etag_state(etag):
+    """
+    (tipo comprimible, comprimida) de la respuesta 200 de este ETag. Si este proceso
+    no la ha servido (otro worker o un reinicio), se deduce del ETag que manda el
+    cliente: con sufijo de codificación es que la recibió comprimida.
+    """
+    with _compressed_etags_lock:
+        state = _compressed_etags.get(etag)
+    if state is not None:
+        return state
+    return True, not request.if_none_match.contains_weak(etag)
+
+
+def _stream(chunks, compressor):
+    """Comprime los pedazos y vacía un bloque cada STREAM_FLUSH_BYTES de entrada y al final"""
+    try:
+        pending = 0
+        for chunk in chunks:
+            if not chunk:
+                continue
+            output = compressor.compress(chunk if isinstance(chunk, bytes) else chunk.encode())
+            pending += len(chunk)
+            if pending >= STREAM_FLUSH_BYTES:
+                output += compressor.flush()
+                pending = 0
+            if output:
+                yield output
+        yield compressor.finish()
+    finally:
+        # === Cierra el generador original (devuelve la conexión si el cliente se fue antes)
+        if hasattr(chunks, "close"):
+            chunks.close()
+
+
+# =============== HOOK ===============
+def compress_response(response):
+    """
+    after_request de Flask: comprime la respuesta con gzip/br/zstd según Accept-Encoding.
+    Las respuestas normales se comprimen completas si superan COMPRESSION_MIN_BYTES;
+    las respuestas en streaming se comprimen pedazo por pedazo sin acumular el cuerpo.
+    """
+    if not COMPRESSION_ENABLED or "Content-Encoding" in response.headers or request.method == "HEAD":
+        return response
+
+    encoding = _negotiate()
+    etag, weak = response.get_etag()
+
+    # === 304: mismo ETag y Vary que tendría la respuesta 200 con esa codificación
+    #     (sin sufijo si esa representación no se comprime por tamaño o tipo)
+    if response.status_code == 304:
+        if etag:
+            compressible, compressed = _etag_state(etag)
+            if compressible:
+                response.vary.add("Accept-Encoding")
+            if encoding and compressed:
+                response.set_etag(f"{etag}-{encoding}", weak)
+        return response
+
+    if not (response.mimetype or "").startswith(_COMPRESSIBLE) or response.direct_passthrough:
+        if etag and response.status_code == 200:
+            _remember_etag(etag, False, False)
+        return response
+    response.vary.add("Accept-Encoding")
+    if not encoding or response.status_code < 200 or response.status_code == 204:
+        return response
+
+    if response.is_streamed:
+        response.response = _stream(response.response, _Compressor(encoding))
+        response.headers.pop("Content-Length", None)
+    else:
+        data = response.get_data()
+        if len(data) < COMPRESSION_MIN_BYTES:
+            if etag and response.status_code == 200:
+                _remember_etag(etag, True, False)
+            return response
+        response.set_data(_Compressor(encoding).compress_all(data))
+
+    response.headers["Content-Encoding"] = encoding
+    if etag:
+        if response.status_code == 200:
+            _remember_etag(etag, True, True)
+        response.set_etag(f"{etag}-{encoding}", weak)
+    return response
@@ -0,0 +1,97 @@
+import os, json, math
+from datetime import date, datetime
+from decimal import Decimal
+import bson
+from bson import ObjectId, json_util
+from flask import make_response, current_app
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional: sin él se usa el json de la librería estándar
+    orjson = None
+
+try:
+    import bsonjs
+except ImportError:  # python-bsonjs viene en requirements.txt; sin él BSON -> JSON pasa por bson.decode
+    bsonjs = None
+
+# ===== Encoder de las respuestas: 'auto' (orjson si está instalado), 'orjson' o 'json'
+ENCODER = os.getenv('API_JSON_ENCODER', 'auto').lower()
+if ENCODER == 'auto':
+    ENCODER = 'orjson' if orjson else 'json'
+if ENCODER == 'orjson' and orjson is None:
+    raise ImportError("API_JSON_ENCODER=orjson requiere instalar el paquete 'orjson'")
+
+
+def _default(value):
+    """Tipos que ninguno de los dos encoders soporta de forma nativa"""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Tipo no serializable: {type(value).__name__}")
+
+
+if ENCODER == 'orjson':
+    _OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps(value, indent=False):
+        """Serializa a bytes (datetime/date/UUID/numpy nativos en orjson)"""
+        return orjson.dumps(value, default=_default, option=_OPTIONS | (orjson.OPT_INDENT_2 if indent else 0))
+else:
+    def dumps(value, indent=False):
+        """Serializa a bytes con el json de la librería estándar"""
+        return json.dumps(value, default=_default, ensure_ascii=False, indent=4 if indent else None).encode()
+
+
+# =============== BSON CRUDO -> EXTENDED JSON (RELAXED) ===============
+def _extended_json_default(value):
+    """ObjectId, fechas, Decimal128, binarios, ... como Extended JSON relaxed ({'$oid': ...}, {'$date': ...})"""
+    return json_util.default(value, json_options=json_util.RELAXED_JSON_OPTIONS)
+
+
+if bsonjs is not None:
+    def bson_to_json(raw):
+        """Documento BSON crudo (bytes) a JSON, convertido en C sin pasar por un dict de Python"""
+        return bsonjs.dumps(raw, mode=bsonjs.RELAXED).encode()
+elif orjson is not None:
+    _RAW_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def _has_non_finite(value):
+        """NaN / Infinity en cualquier nivel del documento (orjson los escribe como null)"""
+        if type(value) is float:
+            return not math.isfinite(value)
+        if isinstance(value, dict):
+            return any(_has_non_finite(item) for item in value.values())
+        if isinstance(value, list):
+            return any(_has_non_finite(item) for item in value)
+        return False
+
+    def bson_to_json(raw):
+        """Documento BSON crudo (bytes) a JSON: bson.decode y orjson (ambos en C)"""
+        doc = bson.decode(raw)
+        # El '_id' se resuelve aquí: pasar por el default de orjson en cada documento cuesta más
+        if type(doc.get("_id")) is ObjectId:
+            doc["_id"] = {"$oid": str(doc["_id"])}
+        data = orjson.dumps(doc, default=_extended_json_default, option=_RAW_OPTIONS)
+        # Solo un documento con null puede traer NaN / Infinity: esos van por json_util
+        # ({"$numberDouble": "NaN"}, igual que bsonjs y el modo sin orjson)
+        if b"null" in data and _has_non_finite(doc):
+            return json_util.dumps(
+                bson.decode(raw), json_options=json_util.RELAXED_JSON_OPTIONS, separators=(",", ":")
+            ).encode()
+        return data
+else:
+    def bson_to_json(raw):
+        """Documento BSON crudo (bytes) a JSON con json_util"""
+        return json_util.dumps(bson.decode(raw), json_options=json_util.RELAXED_JSON_OPTIONS).encode()
+
+
+def output_json(data, code, headers=None):
+    """Representación 'application/json' de flask-restful con el encoder configurado"""
+    response = make_response(dumps(data, indent=current_app.debug) + b"\n", code)
+    response.headers.extend(headers or {})
+    response.mimetype = "application/json"
+    return response
@@ -0,0 +1,298 @@
+import re, base64
+from bson import ObjectId, json_util
+
+# ===== Lenguaje de filtros compartido por PostgresTables y MongoCollections
+# Un filtro se escribe como `campo=valor` (igualdad / IN) o `campo__operador=valor`,
+# por ejemplo `completion_percentage__gte=95` o `age__between=18&age__between=25`.
+OPERATORS = ("eq", "ne", "gt", "gte", "lt", "lte", "between", "like", "in", "is_null")
+OPERATOR_SEPARATOR = "__"
+
+_SQL_COMPARISON = {"gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+_MONGO_COMPARISON = {"gt": "$gt", "gte": "$gte", "lt": "$lt", "lte": "$lte"}
+SQL_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+class FilterError(ValueError):
+    """Filtro mal formado; los endpoints lo convierten en una respuesta 400"""
+
+
+# =============== CONVERSIONES ===============
+def filters_to_args(filters):
+    """
+    Convierte filtros de llamadas directas a pares (clave, valor) tipo query string
+
+    Args:
+        filters (dict): Filtros donde el valor puede ser un escalar, una lista (IN)
+            o un diccionario de operadores, ej: {'age': {'gte': 18, 'lt': 26}}
+
+    Returns:
+        list: Pares (clave, valor) listos para un ImmutableMultiDict
+    """
+    args_list = []
+    for key, value in filters.items():
+        if isinstance(value, dict):
+            for operator, operand in value.items():
+                operands = operand if isinstance(operand, (list, tuple)) else [operand]
+                for v in operands:
+                    args_list.append((f"{key}{OPERATOR_SEPARATOR}{operator}", str(v)))
+        elif isinstance(value, list):
+            for v in value:
+                args_list.append((key, str(v)))
+        else:
+            args_list.append((key, str(value)))
+    return args_list
+
+
+def document_id(value):
+    """'_id' de MongoDB: ObjectId si el texto lo es, si no el valor tal cual (ej. 'M001')"""
+    if isinstance(value, str) and ObjectId.is_valid(value):
+        return ObjectId(value)
+    return value
+
+
+def split_key(key):
+    """Separa 'campo__operador' en (campo, operador); sin operador regresa (campo, None)"""
+    field, separator, operator = key.rpartition(OPERATOR_SEPARATOR)
+    if separator and field and operator in OPERATORS:
+        return field, operator
+    return key, None
+
+
+def convert_value(value, numeric=False):
+    """
+    Conversión básica de tipos de un valor del query string
+
+    Args:
+        value (str): Valor original
+        numeric (bool): Si es True también convierte decimales y negativos a número
+    """
+    if value.lower() == "true":
+        return True
+    if value.lower() == "false":
+        return False
+    if value.isdigit():
+        return int(value)
+    if numeric:
+        try:
+            return int(value)
+        except ValueError:
+            pass
+        try:
+            return float(value)
+        except ValueError:
+            pass
+    return value
+
+
+def parse_fields(values, sql=True):
+    """
+    Lista de campos de una proyección ('fields' repetido o separado por comas), sin duplicados
+
+    Args:
+        values (list): Valores recibidos para 'fields'
+        sql (bool): Valida nombres de columna SQL; si es False solo rechaza operadores de Mongo ($)
+    """
+    fields = list(dict.fromkeys(
+        field.strip() for value in values for field in value.split(",") if field.strip()
+    ))
+    for field in fields:
+        if (sql and not SQL_IDENTIFIER.match(field)) or (not sql and field.startswith("$")):
+            raise FilterError(f"Nombre de campo no válido: '{field}'")
+    return fields
+
+
+def _operands(operator, values):
+    """Valida la cantidad de valores que recibe cada operador"""
+    if operator in ("in", "between") and len(values) == 1:
+        values = values[0].split(",")
+
+    if operator in _SQL_COMPARISON and len(values) != 1:
+        raise FilterError(f"El operador '{operator}' recibe un solo valor")
+    if operator == "between" and len(values) != 2:
+        raise FilterError("El operador 'between' recibe exactamente dos valores (mínimo y máximo)")
+    if operator == "is_null" and (len(values) != 1 or values[0].lower() not in ("true", "false")):
+        raise FilterError("El operador 'is_null' recibe 'true' o 'false'")
+    return values
+
+
+def _like_to_regex(pattern):
+    """Traduce un patrón LIKE de SQL (% y _) a una expresión regular anclada"""
+    return "^" + "".join(
+        ".*" if char == "%" else "." if char == "_" else re.escape(char)
+        for char in pattern
+    ) + "$"
+
+
+# =============== POSTGRESQL ===============
+def sql_condition(key, values):
+    """
+    Compila un filtro a un predicado SQL parametrizado
+
+    Args:
+        key (str): 'campo' o 'campo__operador'
+        values (list): Valores en texto recibidos para esa clave
+
+    Returns:
+        tuple: (condicion_sql, parametros)
+    """
+    field, operator = split_key(key)
+    if not SQL_IDENTIFIER.match(field):
+        raise FilterError(f"Nombre de columna no válido: '{field}'")
+
+    values = _operands(operator, values)
+    if operator == "like":
+        return _sql_predicate(field, operator, values)
+    return _sql_predicate(field, operator, [convert_value(value) for value in values])
+
+
+def sql_filters(filters):
+    """
+    Compila los filtros de un payload JSON (PATCH / DELETE) conservando los tipos de JSON
+
+    Args:
+        filters (dict): {'campo': valor} (igualdad, null = IS NULL), {'campo': [valores]} (IN),
+            {'campo': {'operador': valor}} o {'campo__operador': valor}
+
+    Returns:
+        tuple: (lista_de_condiciones, parametros)
+    """
+    conditions, params = [], []
+    for key, value in filters.items():
+        field, operator = split_key(key)
+        if not SQL_IDENTIFIER.match(field):
+            raise FilterError(f"Nombre de columna no válido: '{field}'")
+
+        if isinstance(value, dict):
+            if operator:
+                raise FilterError(f"El filtro '{key}' ya indica un operador")
+            pairs = list(value.items())
+        elif value is None and operator is None:
+            pairs = [("is_null", True)]
+        else:
+            pairs = [(operator or ("in" if isinstance(value, list) else None), value)]
+
+        for pair_operator, operand in pairs:
+            if pair_operator is not None and pair_operator not in OPERATORS:
+                raise FilterError(f"Operador no soportado: '{pair_operator}'")
+            operands = list(operand) if isinstance(operand, (list, tuple)) else [operand]
+            if not operands:
+                raise FilterError(f"El filtro '{key}' no tiene valores")
+            if pair_operator in _SQL_COMPARISON and len(operands) != 1:
+                raise FilterError(f"El operador '{pair_operator}' recibe un solo valor")
+            if pair_operator == "between" and len(operands) != 2:
+                raise FilterError("El operador 'between' recibe exactamente dos valores (mínimo y máximo)")
+            if pair_operator == "is_null" and not isinstance(operands[0], bool):
+                raise FilterError("El operador 'is_null' recibe true o false")
+
+            condition, condition_params = _sql_predicate(field, pair_operator, operands)
+            conditions.append(condition)
+            params.extend(condition_params)
+    return conditions, params
+
+
+def _sql_predicate(field, operator, operands):
+    """Predicado SQL de un campo con sus operandos ya convertidos"""
+    if operator in (None, "eq", "in"):
+        if len(operands) == 1 and operator != "in":
+            return f"{field} = %s", operands
+        return f"{field} IN ({', '.join(['%s'] * len(operands))})", operands
+
+    if operator == "ne":
+        if len(operands) == 1:
+            return f"{field} <> %s", operands
+        return f"{field} NOT IN ({', '.join(['%s'] * len(operands))})", operands
+
+    if operator in _SQL_COMPARISON:
+        return f"{field} {_SQL_COMPARISON[operator]} %s", operands
+
+    if operator == "between":
+        return f"{field} BETWEEN %s AND %s", operands
+
+    if operator == "like":
+        if len(operands) == 1:
+            return f"{field} LIKE %s", operands
+        return f"{field} LIKE ANY(%s)", [operands]
+
+    # is_null
+    return f"{field} IS {'' if operands[0] else 'NOT '}NULL", []
+
+
+# =============== MONGODB ===============
+def mongo_condition(key, values):
+    """
+    Compila un filtro a una condición de MongoDB
+
+    Args:
+        key (str): 'campo' o 'campo__operador'
+        values (list): Valores en texto recibidos para esa clave
+
+    Returns:
+        tuple: (campo, condicion) donde condicion es un valor o un dict de operadores ($gt, $in, ...)
+    """
+    field, operator = split_key(key)
+    if not field or field.startswith("$"):
+        raise FilterError(f"Nombre de campo no válido: '{field}'")
+
+    values = _operands(operator, values)
+
+    if field in ("_id", "id"):
+        field = "_id"
+        converted = [document_id(value) for value in values] if operator != "is_null" else values
+    else:
+        converted = [convert_value(value, numeric=operator is not None) for value in values]
+
+    if operator in (None, "eq", "in"):
+        if len(converted) == 1 and operator != "in":
+            return field, converted[0]
+        return field, {"$in": converted}
+
+    if operator == "ne":
+        if len(converted) == 1:
+            return field, {"$ne": converted[0]}
+        return field, {"$nin": converted}
+
+    if operator in _MONGO_COMPARISON:
+        return field, {_MONGO_COMPARISON[operator]: converted[0]}
+
+    if operator == "between":
+        return field, {"$gte": converted[0], "$lte": converted[1]}
+
+    if operator == "like":
+        if len(values) == 1:
+            return field, {"$regex": _like_to_regex(values[0])}
+        return field, {"$in": [re.compile(_like_to_regex(value)) for value in values]}
+
+    # is_null
+    return field, {"$eq" if values[0].lower() == "true" else "$ne": None}
+
+
+def merge_mongo_condition(query_filters, field, condition):
+    """Agrega la condición al filtro combinando varios operadores sobre el mismo campo"""
+    if field not in query_filters:
+        query_filters[field] = condition
+        return
+
+    current = query_filters[field]
+    if not (isinstance(current, dict) and all(k.startswith("$") for k in current)):
+        current = {"$eq": current}
+    if not (isinstance(condition, dict) and all(k.startswith("$") for k in condition)):
+        condition = {"$eq": condition}
+    current.update(condition)
+    query_filters[field] = current
+
+
+# =============== PAGINACIÓN KEYSET ===============
+def encode_cursor(last_key):
+    """Token opaco de continuación con la última llave (id / _id) de la página"""
+    return base64.urlsafe_b64encode(json_util.dumps({"k": last_key}).encode()).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """Regresa la última llave guardada en el token ('' o None = primera página)"""
+    if not token:
+        return None
+    try:
+        padding = "=" * (-len(token) % 4)
+        return json_util.loads(base64.urlsafe_b64decode(token + padding))["k"]
+    except Exception:
+        raise FilterError(f"Token 'next' no válido: '{token}'")
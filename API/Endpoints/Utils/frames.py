@@ -0,0 +1,168 @@
+import os, time, threading
+import pandas as pd
+from .hooks import on_write
+
+class FrameCache:
+    """
+    Caché por proceso de DataFrames ya preparados, para que los endpoints
+    no vuelvan a descargar y procesar la tabla completa en cada request.
+
+    Cada entrada guarda la versión de la tabla con la que se construyó
+    (ej. count / max(id) / max(updated_at)). Mientras no pase el TTL se usa
+    directo; al vencer se consulta la versión y solo se recarga si cambió.
+    Las escrituras hechas por esta API la invalidan de inmediato.
+
+    Args:
+        ttl (float): Segundos que una entrada se usa sin volver a validar su versión
+    """
+    # =============== CONSTRUCTOR ===============
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._entries = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+        # Generación por tabla (y global): cambia con cada invalidación
+        self._generation = 0
+        self._generations = {}
+        self._stats = {"hits": 0, "revalidations": 0, "loads": 0, "invalidations": 0}
+
+    # =============== METODOS PRIVADOS ===============
+    def __key_lock(self, key):
+        """Un lock por entrada para que solo un hilo la recargue a la vez"""
+        with self._lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def __generation(self, key):
+        """Generación vigente de la tabla de la entrada (llamar con self._lock tomado)"""
+        return self._generation, self._generations.get(key[0], 0)
+
+    # =============== METODOS PUBLICOS ===============
+    def get(self, key, loader, version_fn):
+        """
+        Regresa el valor en caché o lo reconstruye
+
+        Args:
+            key (tuple): (tabla, variante); la invalidación se hace por tabla
+            loader (callable): Construye el valor (ej. el DataFrame preparado)
+            version_fn (callable): Regresa la versión actual de la tabla
+        """
+        with self.__key_lock(key):
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry and time.monotonic() - entry["checked_at"] < self.ttl:
+                    self._stats["hits"] += 1
+                    return entry["value"]
+                generation = self.__generation(key)
+
+            version = version_fn()
+            with self._lock:
+                # La entrada sigue en caché (no se invalidó mientras se consultaba la versión)
+                if entry and entry["version"] == version and self._entries.get(key) is entry:
+                    entry["checked_at"] = time.monotonic()
+                    self._stats["revalidations"] += 1
+                    return entry["value"]
+
+            value = loader()
+            with self._lock:
+                self._stats["loads"] += 1
+                # Si hubo una invalidación durante la carga el valor puede ser anterior a
+                # esa escritura: se regresa a este request pero no se guarda
+                if self.__generation(key) == generation:
+                    self._entries[key] = {
+                        "value": value,
+                        "version": version,
+                        "checked_at": time.monotonic()
+                    }
+            return value
+
+    def invalidate(self, table=None):
+        """Elimina las entradas de una tabla (o todas si no se indica)"""
+        with self._lock:
+            if table is None:
+                self._generation += 1
+            else:
+                self._generations[table] = self._generations.get(table, 0) + 1
+            for key in list(self._entries):
+                if table is None or key[0] == table:
+                    del self._entries[key]
+                    self._stats["invalidations"] += 1
+
+    def stats(self):
+        """Estadísticas de la caché para el endpoint /info (incluye la memoria de cada entrada)"""
+        with self._lock:
+            entries = {
+                f"{key[0]}:{key[1]}": frame_memory(entry["value"])
+                for key, entry in self._entries.items()
+            }
+            return {
+                "ttl": self.ttl,
+                "entries": entries,
+                "bytes": sum(entry["bytes"] for entry in entries.values()),
+                **self._stats
+            }
+
+
+# =============== CARGA DE DATAFRAMES ===============
+def frame_memory(value):
+    """Filas y bytes (deep) que ocupa un DataFrame en memoria"""
+    if not isinstance(value, pd.DataFrame):
+        return {"rows": None, "bytes": 0}
+    return {"rows": len(value), "bytes": int(value.memory_usage(deep=True).sum())}
+
+
+def load_frame(postgres, table_name, schema, expressions=None):
+    """
+    Carga solo las columnas del esquema y las convierte a tipos compactos
+
+    Args:
+        postgres (PostgresTables): Recurso para consultar la tabla
+        table_name (str): Nombre de la tabla
+        schema (dict): {columna: dtype}; usa 'category' para textos con pocos valores
+            distintos y enteros/flotantes chicos ('Int32', 'float32', ...) para números.
+            Los enteros 'Int*' aceptan nulos.
+        expressions (dict): Expresión SQL opcional por columna, ej. {'work_year': 'NULLIF(work_year, -1)'}
+
+    Returns:
+        DataFrame: Con las columnas del esquema en ese orden
+    """
+    columns = list(schema)
+    expressions = expressions or {}
+    select_items = [
+        f"{expressions[column]} AS {column}" if column in expressions else column
+        for column in columns
+    ]
+    response, code = postgres.query(f"SELECT {', '.join(select_items)} FROM {table_name}")
+    if code != 200:
+        raise Exception(f"Error al obtener datos de '{table_name}' en PostgreSQL: {response}")
+
+    df = pd.DataFrame(response['data'], columns=columns)
+    for column, dtype in schema.items():
+        if dtype != 'category':
+            df[column] = pd.to_numeric(df[column])
+        try:
+            df[column] = df[column].astype(dtype)
+        except (TypeError, ValueError):
+            # Valores con decimales o fuera de rango para el tipo chico
+            df[column] = df[column].astype('float64')
+    return df
+
+
+def process_memory():
+    """Memoria residente (RSS) actual del worker, para el endpoint /info"""
+    try:
+        with open('/proc/self/statm') as statm:
+            rss_pages = int(statm.read().split()[1])
+        return {"pid": os.getpid(), "rss_bytes": rss_pages * os.sysconf('SC_PAGE_SIZE')}
+    except (OSError, ValueError, AttributeError):
+        import resource
+        # ru_maxrss es el pico (KB en Linux) cuando /proc no está disponible
+        return {"pid": os.getpid(), "max_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024}
+
+
+# ===== Caché compartida por el proceso (cada worker de gunicorn tiene la suya)
+frame_cache = FrameCache(ttl=float(os.getenv('FRAME_CACHE_TTL', 300)))
+
+@on_write
+def _invalidate_frames(backend, name):
+    if backend == "postgresql":
+        frame_cache.invalidate(name)
@@ -0,0 +1,27 @@
+import traceback
+
+# ===== Funciones a ejecutar cuando un handler de escritura confirma cambios
+_write_listeners = []
+
+
+def on_write(callback):
+    """
+    Registra una función que se llama con (backend, nombre) cada vez que
+    POST/PATCH/DELETE confirman cambios sobre una tabla o colección.
+    backend es 'postgresql' o 'mongodb'. Puede usarse como decorador.
+    """
+    _write_listeners.append(callback)
+    return callback
+
+
+def notify_write(backend, name):
+    """
+    Avisa a los listeners que 'name' cambió. Un listener que falla no
+    debe tumbar la escritura que ya se confirmó, solo se reporta.
+    """
+    for callback in _write_listeners:
+        try:
+            callback(backend, name)
+        except Exception:
+            print(f"ADVERTENCIA: Falló el listener de escritura {callback!r} para '{name}'")
+            traceback.print_exc()
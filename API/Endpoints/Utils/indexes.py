@@ -0,0 +1,294 @@
+import os, threading, traceback
+from contextlib import closing
+from flask import current_app, request
+from flask_restful import Resource
+from pymongo import ASCENDING
+from .schema import schema_registry
+from .filters import SQL_IDENTIFIER
+
+# ===== Una columna se recomienda indexar cuando se filtra seguido sobre una tabla grande
+INDEX_MIN_HITS = int(os.getenv('INDEX_MIN_HITS', 20))
+INDEX_MIN_ROWS = int(os.getenv('INDEX_MIN_ROWS', 10000))
+
+# ===== BRIN: columnas casi ordenadas físicamente (ej. fechas de inserción) en tablas muy grandes
+BRIN_MIN_ROWS = 100000
+BRIN_MIN_CORRELATION = 0.9
+
+
+class FilterUsage:
+    """
+    Registro por proceso de las columnas usadas en filtros de GET /postgres y
+    GET /mongo: cuántas veces se filtró por cada una y la latencia de esas
+    consultas. Es la base del reporte de índices recomendados.
+    """
+    # =============== CONSTRUCTOR ===============
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    # =============== METODOS PUBLICOS ===============
+    def record(self, backend, name, columns, elapsed_ms=None):
+        """
+        Suma una consulta a cada columna filtrada
+
+        Args:
+            backend (str): 'postgresql' o 'mongodb'
+            name (str): Tabla o colección
+            columns (list): Columnas/campos del filtro
+            elapsed_ms (float): Latencia de la consulta (None en respuestas en streaming)
+        """
+        with self._lock:
+            for column in set(columns):
+                entry = self._entries.setdefault((backend, name, column), {
+                    "hits": 0, "timed": 0, "total_ms": 0.0, "max_ms": 0.0
+                })
+                entry["hits"] += 1
+                if elapsed_ms is not None:
+                    entry["timed"] += 1
+                    entry["total_ms"] += elapsed_ms
+                    entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+
+    def snapshot(self):
+        """Copia de los contadores: {(backend, nombre, columna): {...}}"""
+        with self._lock:
+            return {key: dict(entry) for key, entry in self._entries.items()}
+
+
+# ===== Registro compartido por el proceso (cada worker de gunicorn tiene el suyo)
+filter_usage = FilterUsage()
+
+
+# =============== ESTADO DE TABLAS / COLECCIONES ===============
+def _postgres_table_info(cursor, table_name):
+    """Filas estimadas, columnas que ya encabezan un índice y estadísticas del planner"""
+    # reltuples es -1 hasta el primer ANALYZE / VACUUM; mientras tanto se usa el contador de filas vivas
+    cursor.execute("""
+        SELECT (CASE WHEN c.reltuples >= 0 THEN c.reltuples ELSE COALESCE(s.n_live_tup, 0) END)::bigint
+        FROM pg_class c LEFT JOIN pg_stat_user_tables s ON s.relid = c.oid
+        WHERE c.oid = to_regclass(%s)
+    """, (table_name,))
+    row = cursor.fetchone()
+    if not row:
+        return None
+
+    cursor.execute("""
+        SELECT a.attname
+        FROM pg_index i
+        JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0]
+        WHERE i.indrelid = to_regclass(%s) AND i.indisvalid
+    """, (table_name,))
+    indexed = {name for (name,) in cursor.fetchall()}
+
+    cursor.execute("""
+        SELECT attname, correlation, n_distinct
+        FROM pg_stats
+        WHERE schemaname = current_schema() AND tablename = %s
+    """, (table_name,))
+    statistics = {name: {"correlation": correlation, "n_distinct": n_distinct} for name, correlation, n_distinct in cursor.fetchall()}
+
+    return {"rows": row[0], "columns": schema_registry.columns(table_name, cursor) or {}, "indexed": indexed, "statistics": statistics}
+
+
+def _mongo_collection_info(db, collection_name):
+    """Documentos estimados y campos que ya encabezan un índice"""
+    collection = db[collection_name]
+    indexed = {index["key"][0][0] for index in collection.index_information().values()}
+    return {"rows": collection.estimated_document_count(), "indexed": indexed, "statistics": {}}
+
+
+def _postgres_kind(info, column):
+    """B-tree o BRIN según las estadísticas del planner (None si un índice no ayudaría)"""
+    statistics = info["statistics"].get(column, {})
+    # Columnas casi booleanas: un índice casi nunca gana a recorrer la tabla
+    if statistics.get("n_distinct") is not None and 0 < statistics["n_distinct"] < 3:
+        return None
+    if info["rows"] >= BRIN_MIN_ROWS and abs(statistics.get("correlation") or 0) >= BRIN_MIN_CORRELATION:
+        return "brin"
+    return "btree"
+
+
+def _recommend(backend, hits, info, column):
+    """Tipo de índice recomendado para la columna (None si no hace falta)"""
+    if column in info["indexed"] or hits < INDEX_MIN_HITS or info["rows"] < INDEX_MIN_ROWS:
+        return None
+    if backend == "mongodb":
+        return "ascending"
+    return _postgres_kind(info, column)
+
+
+def index_report(get_connection, db):
+    """
+    Columnas filtradas con su uso, latencia, si ya tienen índice y la recomendación
+
+    Returns:
+        list: Entradas ordenadas por tiempo total consumido en consultas
+    """
+    usage = filter_usage.snapshot()
+    targets = {(backend, name) for backend, name, _ in usage}
+
+    infos = {}
+    with closing(get_connection()) as conn:
+        with conn.cursor() as cursor:
+            for backend, name in targets:
+                if backend == "postgresql":
+                    infos[(backend, name)] = _postgres_table_info(cursor, name)
+    for backend, name in targets:
+        if backend == "mongodb":
+            infos[(backend, name)] = _mongo_collection_info(db, name)
+
+    report = []
+    for (backend, name, column), entry in usage.items():
+        info = infos.get((backend, name))
+        # === Tablas borradas o columnas que no existen (el filtro falló en la consulta)
+        if info is None or (backend == "postgresql" and column not in info["columns"]):
+            continue
+        report.append({
+            "backend": backend,
+            "name": name,
+            "column": column,
+            "hits": entry["hits"],
+            "avg_ms": round(entry["total_ms"] / entry["timed"], 2) if entry["timed"] else None,
+            "max_ms": round(entry["max_ms"], 2) if entry["timed"] else None,
+            "total_ms": round(entry["total_ms"], 2),
+            "rows": info["rows"],
+            "indexed": column in info["indexed"],
+            "recommended": _recommend(backend, entry["hits"], info, column)
+        })
+    return sorted(report, key=lambda item: item["total_ms"], reverse=True)
+
+
+# =============== CREACIÓN ===============
+def create_postgres_index(get_connection, table_name, column, kind="btree"):
+    """
+    CREATE INDEX CONCURRENTLY (no bloquea las escrituras de la tabla mientras se construye).
+    CONCURRENTLY no puede ir dentro de una transacción, así que la conexión usa autocommit;
+    el pool la regresa a su modo normal al devolverla.
+
+    Returns:
+        str: Nombre del índice
+    """
+    index_name = f"{table_name}_{column}_{kind}_idx"
+    with closing(get_connection()) as conn:
+        conn.set_session(autocommit=True)
+        with conn.cursor() as cursor:
+            try:
+                cursor.execute(
+                    f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {index_name} ON {table_name} USING {kind} ({column})"
+                )
+            except Exception:
+                # Un CONCURRENTLY fallido deja un índice inválido que IF NOT EXISTS ya no reintentaría
+                cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name}")
+                raise
+    return index_name
+
+
+def create_mongo_index(db, collection_name, field):
+    """Índice ascendente sobre el campo (create_index no hace nada si ya existe)"""
+    return db[collection_name].create_index([(field, ASCENDING)])
+
+
+class Indexes(Resource):
+    '''
+    Reporte de las columnas más filtradas y creación de los índices recomendados
+    (B-tree / BRIN en PostgreSQL, create_index en MongoDB)
+    '''
+    KINDS = ("auto", "btree", "brin")
+
+    # =============== CONSTRUCTOR ===============
+    def __init__(self):
+        self.get_connection = current_app.config["get_postgres_connection"]
+        self.db = current_app.config["mongo_db"]
+
+    # =============== METODOS PRIVADOS ===============
+    def __create(self, backend, name, column, kind):
+        """Crea un índice y regresa su descripción para la respuesta"""
+        if backend == "mongodb":
+            return {"backend": backend, "name": name, "column": column, "kind": "ascending",
+                    "index": create_mongo_index(self.db, name, column)}
+
+        if kind == "auto":
+            with closing(self.get_connection()) as conn:
+                with conn.cursor() as cursor:
+                    info = _postgres_table_info(cursor, name)
+            kind = _postgres_kind(info, column) or "btree"
+        return {"backend": backend, "name": name, "column": column, "kind": kind,
+                "index": create_postgres_index(self.get_connection, name, column, kind)}
+
+    # =============== METODOS HTTP ===============
+    def get(self):
+        try:
+            report = index_report(self.get_connection, self.db)
+            return {
+                "status": "success",
+                "info": {
+                    "thresholds": {"min_hits": INDEX_MIN_HITS, "min_rows": INDEX_MIN_ROWS},
+                    "columns": report,
+                    "recommended": [item for item in report if item["recommended"]]
+                }
+            }, 200
+
+        except Exception:
+            return {
+                "status": "error",
+                "info": traceback.format_exc().splitlines()
+            }, 500
+
+    def post(self):
+        try:
+            # ===== Data
+            payload = request.json or {}
+
+            # ===== Crear todos los recomendados por el reporte
+            if payload.get("recommended"):
+                targets = [
+                    (item["backend"], item["name"], item["column"], item["recommended"])
+                    for item in index_report(self.get_connection, self.db) if item["recommended"]
+                ]
+
+            # ===== Crear un índice puntual
+            else:
+                backend = payload.get("backend")
+                name = payload.get("name")
+                column = payload.get("column")
+                kind = payload.get("kind", "auto")
+
+                if backend not in ("postgresql", "mongodb") or not name or not column:
+                    return {
+                        "status": "error",
+                        "info": "Valida que se encuentren 'backend' ('postgresql' o 'mongodb'), 'name' y 'column' en el payload, o 'recommended': true"
+                    }, 400
+
+                if kind not in self.KINDS:
+                    return {
+                        "status": "error",
+                        "info": "Valida que 'kind' sea 'auto', 'btree' o 'brin'"
+                    }, 400
+
+                if backend == "postgresql":
+                    if not SQL_IDENTIFIER.match(name):
+                        return {"status": "error", "info": f"Nombre de tabla no válido: '{name}'"}, 400
+                    with closing(self.get_connection()) as conn:
+                        with conn.cursor() as cursor:
+                            columns = schema_registry.columns(name, cursor)
+                    if columns is None or column not in columns:
+                        return {
+                            "status": "error",
+                            "info": f"La columna '{column}' no existe en la tabla '{name}'"
+                        }, 404
+                elif column.startswith("$"):
+                    return {"status": "error", "info": f"Nombre de campo no válido: '{column}'"}, 400
+
+                targets = [(backend, name, column, kind)]
+
+            created = [self.__create(*target) for target in targets]
+            return {
+                "status": "created",
+                "info": f"Se crearon {len(created)} índices",
+                "indexes": created
+            }, 201 if created else 200
+
+        except Exception:
+            return {
+                "status": "error",
+                "info": traceback.format_exc().splitlines()
+            }, 500
@@ -2,11 +2,15 @@ from flask_restful import Resource
 from flask import current_app
 from contextlib import closing
 from pymongo import MongoClient
+from .frames import frame_cache, process_memory
+from .cache import response_cache
+from .schema import schema_registry
 
 class Info(Resource):
     def __init__(self):
         self.db: MongoClient = current_app.config["mongo_db"]
         self.get_connection = current_app.config["get_postgres_connection"]
+        self.pool = current_app.config.get("postgres_pool")
 
     def get(self):
         try:
@@ -53,7 +57,14 @@ class Info(Resource):
                     "status": postgres_status,
                     "version": postgres_version,
                     "tables": postgres_tables,
-                    "table_count": len(postgres_tables)
+                    "table_count": len(postgres_tables),
+                    "pool": self.pool.stats() if self.pool else None
                 }
-            }
+            },
+            "caches": {
+                "frames": frame_cache.stats(),
+                "responses": response_cache.stats(),
+                "schemas": schema_registry.stats()
+            },
+            "worker": process_memory()
         }, 200
\ No newline at end of file
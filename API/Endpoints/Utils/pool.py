@@ -0,0 +1,240 @@
+import time, threading
+from psycopg2 import extensions
+
+class PoolTimeout(Exception):
+    """Se lanza cuando no se obtiene una conexión del pool dentro del tiempo de espera"""
+
+
+class PooledConnection:
+    """
+    Envoltorio de una conexión psycopg2 prestada por el pool.
+
+    Delega todo a la conexión real, excepto `close()`, que la regresa al pool
+    en lugar de cerrarla. Así el código existente puede seguir usando
+    `with closing(self.get_connection()) as conn:` sin cambios.
+    """
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name):
+        if self._conn is None:
+            raise AttributeError(f"La conexión ya fue devuelta al pool ('{name}')")
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        self._conn.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        return self._conn.__exit__(exc_type, exc_value, tb)
+
+    @property
+    def closed(self):
+        return 1 if self._conn is None else self._conn.closed
+
+    def close(self):
+        """Regresa la conexión al pool (idempotente)"""
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool.release(conn)
+
+
+class PostgresPool:
+    """
+    Pool de conexiones PostgreSQL compartido por todo el proceso.
+
+    Args:
+        connect (callable): Función que abre una conexión psycopg2 nueva
+        minconn (int): Conexiones inactivas que nunca se cierran por inactividad
+        maxconn (int): Máximo de conexiones abiertas al mismo tiempo (en uso + inactivas)
+        timeout (float): Segundos de espera por una conexión libre antes de fallar
+        health_check (bool): Si es True, valida la conexión con 'SELECT 1' al prestarla
+        idle_timeout (float): Segundos que se conserva una conexión inactiva por encima
+            de 'minconn' antes de cerrarla (None para no cerrarlas nunca)
+    """
+    # =============== CONSTRUCTOR ===============
+    def __init__(self, connect, minconn=2, maxconn=10, timeout=30.0, health_check=True, idle_timeout=300.0):
+        if maxconn < 1:
+            raise ValueError("'maxconn' debe ser mayor o igual a 1")
+
+        self._connect = connect
+        self.minconn = max(0, min(minconn, maxconn))
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.health_check = health_check
+        self.idle_timeout = idle_timeout
+
+        # (conexión, momento en que se devolvió), de la más antigua a la más reciente
+        self._idle = []
+        self._in_use = 0
+        self._lock = threading.Condition()
+        self._stats = {
+            "created": 0,
+            "discarded": 0,
+            "checkouts": 0,
+            "waits": 0,
+            "wait_time": 0.0,
+            "timeouts": 0
+        }
+
+    # =============== METODOS PRIVADOS ===============
+    def __is_healthy(self, conn):
+        """Valida que la conexión siga viva antes de prestarla"""
+        if conn.closed:
+            return False
+        if not self.health_check:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def __discard(self, conn):
+        """Cierra una conexión que ya no debe reutilizarse"""
+        try:
+            if not conn.closed:
+                conn.close()
+        except Exception:
+            pass
+        with self._lock:
+            self._stats["discarded"] += 1
+
+    def __expired(self):
+        """
+        Saca (con el lock tomado) las conexiones inactivas que pasaron 'idle_timeout',
+        empezando por las más antiguas y sin bajar de 'minconn'
+        """
+        expired = []
+        if self.idle_timeout is None:
+            return expired
+        limit = time.monotonic() - self.idle_timeout
+        while len(self._idle) > self.minconn and self._idle[0][1] < limit:
+            expired.append(self._idle.pop(0)[0])
+        return expired
+
+    def __acquire(self):
+        """
+        Obtiene una conexión inactiva o reserva espacio para abrir una nueva.
+        Espera hasta 'timeout' segundos si el pool está lleno.
+        """
+        deadline = time.monotonic() + self.timeout
+        started = time.monotonic()
+        waited = False
+
+        with self._lock:
+            while True:
+                # La más reciente: así las que sobran envejecen y se cierran por inactividad
+                if self._idle:
+                    conn, _ = self._idle.pop()
+                    break
+                if self._in_use + len(self._idle) < self.maxconn:
+                    conn = None
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise PoolTimeout(
+                        f"No hay conexiones disponibles en el pool después de {self.timeout} segundos "
+                        f"(máximo: {self.maxconn})"
+                    )
+                waited = True
+                self._lock.wait(remaining)
+
+            self._in_use += 1
+            self._stats["checkouts"] += 1
+            if waited:
+                self._stats["waits"] += 1
+                self._stats["wait_time"] += time.monotonic() - started
+
+        return conn
+
+    # =============== METODOS PUBLICOS ===============
+    def get_connection(self):
+        """
+        Presta una conexión del pool. Al llamar `close()` sobre ella regresa al pool.
+
+        Returns:
+            PooledConnection: Conexión envuelta
+        """
+        conn = self.__acquire()
+
+        try:
+            if conn is not None and not self.__is_healthy(conn):
+                self.__discard(conn)
+                conn = None
+
+            if conn is None:
+                conn = self._connect()
+                with self._lock:
+                    self._stats["created"] += 1
+        except Exception:
+            with self._lock:
+                self._in_use -= 1
+                self._lock.notify()
+            raise
+
+        return PooledConnection(self, conn)
+
+    def release(self, conn):
+        """
+        Regresa una conexión al pool. Si quedó con una transacción abierta se
+        hace rollback; si está rota, se cierra. Las sanas se conservan (el total
+        nunca pasa de 'maxconn') y las inactivas de más se cierran después de
+        'idle_timeout'.
+        """
+        keep = not conn.closed
+        if keep:
+            try:
+                status = conn.get_transaction_status()
+                if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                    keep = False
+                elif status != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                if keep and conn.autocommit:
+                    conn.autocommit = False
+            except Exception:
+                keep = False
+
+        with self._lock:
+            self._in_use -= 1
+            if keep:
+                self._idle.append((conn, time.monotonic()))
+                conn = None
+            expired = self.__expired()
+            self._lock.notify()
+
+        if conn is not None:
+            self.__discard(conn)
+        for idle in expired:
+            self.__discard(idle)
+
+    def stats(self):
+        """Estadísticas del pool para el endpoint /info"""
+        with self._lock:
+            return {
+                "min_size": self.minconn,
+                "max_size": self.maxconn,
+                "timeout": self.timeout,
+                "health_check": self.health_check,
+                "idle_timeout": self.idle_timeout,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "created": self._stats["created"],
+                "discarded": self._stats["discarded"],
+                "checkouts": self._stats["checkouts"],
+                "waits": self._stats["waits"],
+                "wait_time_ms": round(self._stats["wait_time"] * 1000, 2),
+                "timeouts": self._stats["timeouts"]
+            }
+
+    def close_all(self):
+        """Cierra todas las conexiones inactivas del pool"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self.__discard(conn)
@@ -0,0 +1,361 @@
+from contextlib import closing
+from psycopg2.extras import execute_values, Json
+
+# ===== Tablas resumen de las métricas de los dashboards
+# Cada rollup indica sus tablas origen (con las columnas que lee de cada una), sus llaves y
+# valores, la consulta que lo calcula desde cero y el delta de un lote nuevo por tabla origen.
+# Los deltas leen el lote de la tabla temporal _rollup_batch (con los tipos de la tabla origen).
+# Las llaves usan -1 / '' en lugar de NULL para poder usarlas como PRIMARY KEY.
+ROLLUPS = {
+    "rollup_row_counts": {
+        "sources": {"viewing_sessions": ()},
+        "ddl": """
+            CREATE TABLE IF NOT EXISTS rollup_row_counts (
+                source_table TEXT PRIMARY KEY,
+                rows BIGINT NOT NULL
+            )
+        """,
+        "keys": ["source_table"],
+        "values": ["rows"],
+        "select": "SELECT 'viewing_sessions', count(*) FROM viewing_sessions",
+        "deltas": {
+            "viewing_sessions": "SELECT 'viewing_sessions', %(rows)s::bigint"
+        },
+        "empty": "INSERT INTO rollup_row_counts (source_table, rows) VALUES ('viewing_sessions', 0)"
+    },
+    "rollup_engagement": {
+        "sources": {
+            "users": ("user_id", "age", "country"),
+            "viewing_sessions": ("user_id", "completion_percentage"),
+        },
+        "ddl": """
+            CREATE TABLE IF NOT EXISTS rollup_engagement (
+                age INTEGER NOT NULL,
+                country TEXT NOT NULL,
+                sessions BIGINT NOT NULL,
+                completed BIGINT NOT NULL,
+                abandoned BIGINT NOT NULL,
+                PRIMARY KEY (age, country)
+            )
+        """,
+        "keys": ["age", "country"],
+        "values": ["sessions", "completed", "abandoned"],
+        "select": """
+            SELECT
+                COALESCE(u.age, -1),
+                COALESCE(u.country, ''),
+                count(*),
+                count(*) FILTER (WHERE vs.completion_percentage >= 95),
+                count(*) FILTER (WHERE vs.completion_percentage < 30)
+            FROM viewing_sessions vs
+            JOIN (SELECT DISTINCT user_id, age, country FROM users) u ON u.user_id = vs.user_id
+            GROUP BY 1, 2
+        """,
+        "deltas": {
+            # === Sesiones nuevas de usuarios que ya existen
+            "viewing_sessions": """
+                SELECT
+                    COALESCE(u.age, -1),
+                    COALESCE(u.country, ''),
+                    count(*),
+                    count(*) FILTER (WHERE b.completion_percentage >= 95),
+                    count(*) FILTER (WHERE b.completion_percentage < 30)
+                FROM _rollup_batch b
+                JOIN (
+                    SELECT DISTINCT user_id, age, country FROM users
+                    WHERE user_id IN (SELECT user_id FROM _rollup_batch)
+                ) u ON u.user_id = b.user_id
+                GROUP BY 1, 2
+            """,
+            # === Solo cuentan los usuarios (user_id, age, country) que aún no existían;
+            #     se ejecuta antes del INSERT, así que 'users' todavía no los incluye
+            "users": """
+                SELECT
+                    COALESCE(n.age, -1),
+                    COALESCE(n.country, ''),
+                    count(*),
+                    count(*) FILTER (WHERE vs.completion_percentage >= 95),
+                    count(*) FILTER (WHERE vs.completion_percentage < 30)
+                FROM (
+                    SELECT user_id, age, country FROM _rollup_batch WHERE user_id IS NOT NULL
+                    EXCEPT
+                    SELECT user_id, age, country FROM users
+                    WHERE user_id IN (SELECT user_id FROM _rollup_batch)
+                ) n
+                JOIN viewing_sessions vs ON vs.user_id = n.user_id
+                GROUP BY 1, 2
+            """
+        }
+    },
+    "rollup_subscription": {
+        "sources": {"users": ("subscription_type", "total_watch_time_hours")},
+        "ddl": """
+            CREATE TABLE IF NOT EXISTS rollup_subscription (
+                subscription_type TEXT PRIMARY KEY,
+                users BIGINT NOT NULL,
+                watch_hours DOUBLE PRECISION NOT NULL
+            )
+        """,
+        "keys": ["subscription_type"],
+        "values": ["users", "watch_hours"],
+        "select": """
+            SELECT COALESCE(subscription_type, ''), count(*), COALESCE(sum(total_watch_time_hours::double precision), 0)
+            FROM users
+            GROUP BY 1
+        """,
+        "deltas": {
+            "users": """
+                SELECT COALESCE(subscription_type, ''), count(*), COALESCE(sum(total_watch_time_hours::double precision), 0)
+                FROM _rollup_batch
+                GROUP BY 1
+            """
+        }
+    },
+    "rollup_tech_salaries": {
+        "sources": {
+            "tech_salaries": (
+                "work_year", "experience_level", "employee_residence", "job_title",
+                "company_size", "remote_ratio", "salary_in_usd"
+            )
+        },
+        "ddl": """
+            CREATE TABLE IF NOT EXISTS rollup_tech_salaries (
+                work_year INTEGER NOT NULL,
+                experience_level TEXT NOT NULL,
+                employee_residence TEXT NOT NULL,
+                job_title TEXT NOT NULL,
+                company_size TEXT NOT NULL,
+                remote_ratio INTEGER NOT NULL,
+                salary_sum DOUBLE PRECISION NOT NULL,
+                salary_count BIGINT NOT NULL,
+                rows BIGINT NOT NULL,
+                PRIMARY KEY (work_year, experience_level, employee_residence, job_title, company_size, remote_ratio)
+            )
+        """,
+        "keys": ["work_year", "experience_level", "employee_residence", "job_title", "company_size", "remote_ratio"],
+        "values": ["salary_sum", "salary_count", "rows"],
+        "select": """
+            SELECT
+                COALESCE(work_year, -1), COALESCE(experience_level, ''), COALESCE(employee_residence, ''),
+                COALESCE(job_title, ''), COALESCE(company_size, ''), COALESCE(remote_ratio, -1),
+                COALESCE(sum(salary_in_usd::double precision), 0), count(salary_in_usd), count(*)
+            FROM tech_salaries
+            GROUP BY 1, 2, 3, 4, 5, 6
+        """,
+        "deltas": {
+            "tech_salaries": """
+                SELECT
+                    COALESCE(work_year, -1), COALESCE(experience_level, ''), COALESCE(employee_residence, ''),
+                    COALESCE(job_title, ''), COALESCE(company_size, ''), COALESCE(remote_ratio, -1),
+                    COALESCE(sum(salary_in_usd::double precision), 0), count(salary_in_usd), count(*)
+                FROM _rollup_batch
+                GROUP BY 1, 2, 3, 4, 5, 6
+            """
+        }
+    },
+}
+
+_STATE_DDL = """
+    CREATE TABLE IF NOT EXISTS rollup_state (
+        name TEXT PRIMARY KEY,
+        version BIGINT NOT NULL DEFAULT 0,
+        built_at TIMESTAMP
+    )
+"""
+
+# ===== Llave del advisory lock que serializa la creación/reconstrucción entre workers.
+#       Cada rollup además tiene su propio lock (_LOCK_KEY, posición en ROLLUPS): los deltas
+#       de los POST lo toman compartido y las actualizaciones de PATCH / DELETE exclusivo.
+#       Los rollups que cruzan varias tablas origen (ej. users + viewing_sessions) lo toman
+#       exclusivo también en los POST: su delta lee las otras tablas, y un POST concurrente
+#       a la otra tabla no vería las filas sin confirmar del primero.
+_LOCK_KEY = 7310001
+
+# ===== Rollups que este proceso ya confirmó como construidos
+_ready = set()
+
+
+# =============== UTILIDADES ===============
+def _table_exists(cursor, table_name):
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL", (table_name,))
+    return cursor.fetchone()[0]
+
+
+def _built(cursor, names):
+    """Rollups (de 'names') que ya están construidos según rollup_state"""
+    if not names or not _table_exists(cursor, "rollup_state"):
+        return set()
+    cursor.execute("SELECT name FROM rollup_state WHERE name IN %s", (tuple(names),))
+    return {row[0] for row in cursor.fetchall()}
+
+
+def _lock(cursor, name, shared=False):
+    function = "pg_advisory_xact_lock_shared" if shared else "pg_advisory_xact_lock"
+    cursor.execute(f"SELECT {function}(%s, %s)", (_LOCK_KEY, list(ROLLUPS).index(name)))
+
+
+def _bump(cursor, names):
+    cursor.execute("UPDATE rollup_state SET version = version + 1 WHERE name IN %s", (tuple(names),))
+
+
+def _columns(name):
+    rollup = ROLLUPS[name]
+    return ", ".join(rollup["keys"] + rollup["values"])
+
+
+def _stage(cursor, table_name, columns, data_list):
+    """
+    Copia las columnas que leen los deltas a la tabla temporal _rollup_batch, creada con
+    los tipos de la tabla origen: PostgreSQL convierte los valores del payload (ej. '25'
+    en una columna INTEGER) igual que en el INSERT real, así los deltas y las llaves del
+    rollup se comparan con los mismos tipos que ya están en la tabla
+    """
+    cursor.execute("DROP TABLE IF EXISTS _rollup_batch")
+    cursor.execute(
+        f"CREATE TEMP TABLE _rollup_batch ON COMMIT DROP AS SELECT {', '.join(columns)} FROM {table_name} WITH NO DATA"
+    )
+    execute_values(cursor, f"INSERT INTO _rollup_batch ({', '.join(columns)}) VALUES %s", [
+        tuple(Json(value) if isinstance(value, (dict, list)) else value for value in map(record.get, columns))
+        for record in data_list
+    ])
+
+
+def dependents(table_name):
+    """Rollups que se calculan a partir de 'table_name'"""
+    return [name for name, rollup in ROLLUPS.items() if table_name in rollup["sources"]]
+
+
+# =============== API DEL SUBSISTEMA ===============
+def rebuild(cursor, names=None):
+    """
+    Reconstruye rollups desde las tablas origen dentro de la transacción del cursor
+
+    Args:
+        cursor: Cursor de una conexión sin autocommit (el llamador hace commit)
+        names (list): Rollups a reconstruir; todos si no se indica
+
+    Returns:
+        list: Nombres reconstruidos
+    """
+    names = list(names or ROLLUPS)
+    cursor.execute("SELECT pg_advisory_xact_lock(%s)", (_LOCK_KEY,))
+    cursor.execute(_STATE_DDL)
+
+    for name in names:
+        rollup = ROLLUPS[name]
+        cursor.execute(rollup["ddl"])
+        cursor.execute(f"TRUNCATE {name}")
+
+        if all(_table_exists(cursor, source) for source in rollup["sources"]):
+            cursor.execute(f"INSERT INTO {name} ({_columns(name)}) {rollup['select']}")
+        elif rollup.get("empty"):
+            cursor.execute(rollup["empty"])
+
+        cursor.execute("""
+            INSERT INTO rollup_state (name, version, built_at) VALUES (%s, 1, now())
+            ON CONFLICT (name) DO UPDATE SET version = rollup_state.version + 1, built_at = now()
+        """, (name,))
+
+    return names
+
+
+def ensure(get_connection, names):
+    """
+    Garantiza que los rollups existan antes de leerlos; los que nunca se han
+    construido se construyen completos una sola vez (protegido entre workers)
+    """
+    missing = [name for name in names if name not in _ready]
+    if not missing:
+        return
+
+    with closing(get_connection()) as conn:
+        with conn.cursor() as cursor:
+            if set(missing) - _built(cursor, missing):
+                cursor.execute("SELECT pg_advisory_xact_lock(%s)", (_LOCK_KEY,))
+                pending = set(missing) - _built(cursor, missing)
+                if pending:
+                    rebuild(cursor, [name for name in missing if name in pending])
+        conn.commit()
+
+    _ready.update(missing)
+
+
+def apply_insert(cursor, table_name, data_list):
+    """
+    Suma al rollup el lote que se va a insertar en 'table_name'. Se llama dentro
+    de la transacción del POST y antes del INSERT, así el rollup y la tabla se
+    confirman (o se revierten) juntos. Si el rollup aún no se construye, no hace
+    nada: la primera lectura lo construirá completo. Los deltas de rollups con
+    varias tablas origen se serializan hasta el commit (READ COMMITTED: el delta
+    que espera el lock ya ve las filas que confirmó el anterior).
+    """
+    built = _built(cursor, dependents(table_name))
+    built = [
+        name for name in ROLLUPS
+        if name in built and all(_table_exists(cursor, source) for source in ROLLUPS[name]["sources"])
+    ]
+    if not built:
+        return
+
+    columns = sorted({column for name in built for column in ROLLUPS[name]["sources"][table_name]})
+    if columns:
+        _stage(cursor, table_name, columns, data_list)
+
+    for name in built:
+        rollup = ROLLUPS[name]
+        _lock(cursor, name, shared=len(rollup["sources"]) == 1)
+        updates = ", ".join(f"{column} = {name}.{column} + EXCLUDED.{column}" for column in rollup["values"])
+        cursor.execute(f"""
+            INSERT INTO {name} ({_columns(name)}) {rollup['deltas'][table_name]}
+            ON CONFLICT ({', '.join(rollup['keys'])}) DO UPDATE SET {updates}
+        """, {"rows": len(data_list)})
+    _bump(cursor, built)
+
+
+def refresh(cursor, table_name, columns=None):
+    """
+    Recalcula los rollups de 'table_name' después de un UPDATE/DELETE, dentro de la
+    misma transacción (esas operaciones no tienen delta incremental). Cada rollup se
+    agrega otra vez desde sus tablas origen, pero solo se escriben las llaves que
+    cambiaron y no se bloquea la tabla del rollup (las lecturas de los dashboards
+    siguen). Las escrituras que recalculan un mismo rollup se esperan entre sí.
+
+    Args:
+        cursor: Cursor dentro de la transacción de la escritura
+        table_name (str): Tabla modificada
+        columns (iterable): Columnas actualizadas (PATCH); los rollups que no leen
+            ninguna de ellas no cambian y se omiten. None para DELETE / upsert
+    """
+    built = _built(cursor, dependents(table_name))
+    names = [
+        name for name in ROLLUPS
+        if name in built and (columns is None or set(columns) & set(ROLLUPS[name]["sources"][table_name]))
+    ]
+
+    for name in names:
+        rollup = ROLLUPS[name]
+        _lock(cursor, name)
+
+        if not all(_table_exists(cursor, source) for source in rollup["sources"]):
+            cursor.execute(f"DELETE FROM {name}")
+            if rollup.get("empty"):
+                cursor.execute(rollup["empty"])
+            continue
+
+        keys = ", ".join(rollup["keys"])
+        matches = " AND ".join(f"fresh.{key} = {name}.{key}" for key in rollup["keys"])
+        updates = ", ".join(f"{column} = EXCLUDED.{column}" for column in rollup["values"])
+        current = ", ".join(f"{name}.{column}" for column in rollup["values"])
+        excluded = ", ".join(f"EXCLUDED.{column}" for column in rollup["values"])
+        cursor.execute(f"""
+            WITH fresh ({_columns(name)}) AS ({rollup['select']}),
+            removed AS (
+                DELETE FROM {name} WHERE NOT EXISTS (SELECT 1 FROM fresh WHERE {matches})
+            )
+            INSERT INTO {name} ({_columns(name)}) SELECT {_columns(name)} FROM fresh
+            ON CONFLICT ({keys}) DO UPDATE SET {updates}
+            WHERE ({current}) IS DISTINCT FROM ({excluded})
+        """)
+
+    if names:
+        _bump(cursor, names)
@@ -0,0 +1,231 @@
+import os, json, time, threading
+import pandas as pd
+
+# ===== Registros que se revisan para inferir los tipos de una tabla nueva
+SCHEMA_SAMPLE_SIZE = 1000
+
+_INT32_MAX = 2 ** 31 - 1
+_BOOLEAN_TEXT = {"true": True, "t": True, "1": True, "yes": True, "false": False, "f": False, "0": False, "no": False}
+
+
+class SchemaError(ValueError):
+    """El lote no coincide con el esquema de la tabla; los endpoints lo convierten en una respuesta 400"""
+
+
+class SchemaRegistry:
+    """
+    Caché por proceso de las columnas (y sus tipos) de cada tabla, para no
+    consultar el catálogo de PostgreSQL en cada request.
+
+    Solo se guardan tablas que existen y ya confirmadas (una tabla que la API
+    crea se registra en el siguiente request). Un error de tabla o columna
+    inexistente invalida la entrada y el TTL acota cuánto tarda en verse un
+    cambio de esquema hecho fuera de la API.
+
+    Args:
+        ttl (float): Segundos que una entrada se usa sin volver a leer el catálogo
+    """
+    # =============== CONSTRUCTOR ===============
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "loads": 0, "invalidations": 0}
+
+    # =============== METODOS PUBLICOS ===============
+    def lookup(self, table_name):
+        """Columnas en caché de la tabla, sin tocar la base de datos (None si no están)"""
+        with self._lock:
+            entry = self._entries.get(table_name)
+            if entry and time.monotonic() - entry["loaded_at"] < self.ttl:
+                self._stats["hits"] += 1
+                return entry["columns"]
+            return None
+
+    def columns(self, table_name, cursor, required=()):
+        """
+        Columnas de la tabla con su tipo, en orden, ej: {'id': 'integer', 'meta': 'jsonb'}
+
+        Args:
+            table_name (str): Tabla a consultar
+            cursor: Cursor abierto, solo se usa si la tabla no está en caché
+            required (iterable): Columnas que el request va a usar; si la entrada en caché
+                no tiene alguna (ej. un ALTER TABLE hecho fuera de la API) se vuelve a leer
+                el catálogo una vez antes de darla por inexistente
+
+        Returns:
+            dict | None: None si la tabla no existe
+        """
+        columns = self.lookup(table_name)
+        if columns is not None:
+            if all(column in columns for column in required):
+                return columns
+            self.invalidate(table_name)
+
+        cursor.execute("""
+            SELECT attname, format_type(atttypid, atttypmod)
+            FROM pg_attribute
+            WHERE attrelid = to_regclass(%s) AND attnum > 0 AND NOT attisdropped
+            ORDER BY attnum
+        """, (table_name,))
+        columns = dict(cursor.fetchall())
+        if not columns:
+            return None
+
+        with self._lock:
+            self._entries[table_name] = {"columns": columns, "loaded_at": time.monotonic()}
+            self._stats["loads"] += 1
+        return columns
+
+    def invalidate(self, table_name=None):
+        """Olvida el esquema de una tabla (o de todas si no se indica)"""
+        with self._lock:
+            for name in [name for name in self._entries if table_name is None or name == table_name]:
+                del self._entries[name]
+                self._stats["invalidations"] += 1
+
+    def stats(self):
+        """Estadísticas de la caché para el endpoint /info"""
+        with self._lock:
+            return {"ttl": self.ttl, "tables": len(self._entries), **self._stats}
+
+
+# ===== Registro compartido por el proceso (cada worker de gunicorn tiene el suyo)
+schema_registry = SchemaRegistry(ttl=float(os.getenv('SCHEMA_CACHE_TTL', 300)))
+
+
+# =============== INFERENCIA DE TIPOS ===============
+def infer_column_types(records, sample_size=SCHEMA_SAMPLE_SIZE):
+    """
+    Tipos SQL de una tabla nueva a partir de una muestra repartida por todo el
+    lote (no solo el primer registro). Una columna sin valores en la muestra
+    toma el tipo de su primer valor no nulo en el lote.
+
+    Args:
+        records (list): Registros del lote
+        sample_size (int): Registros a revisar
+
+    Returns:
+        dict: {columna: tipo_sql} en orden de aparición
+    """
+    sample = records[::max(1, len(records) // sample_size)]
+    columns = dict.fromkeys(key for record in records for key in record)
+
+    column_types = {}
+    for column in columns:
+        seen = {type(record.get(column)) for record in sample} - {type(None)}
+        if not seen:
+            value = next((record[column] for record in records if record.get(column) is not None), None)
+            seen = {type(value)} - {type(None)}
+
+        if not seen:
+            column_type = "TEXT"
+        elif seen == {bool}:
+            column_type = "BOOLEAN"
+        elif seen == {int}:
+            # === Enteros: se revisa todo el lote, un decimal o un valor grande fuera de la muestra rompería el INSERT
+            numbers = [record.get(column) for record in records]
+            if float in set(map(type, numbers)):
+                column_type = "REAL"
+            else:
+                largest = max((abs(number) for number in numbers if type(number) is int), default=0)
+                column_type = "BIGINT" if largest > _INT32_MAX else "INTEGER"
+        elif seen <= {int, float}:
+            column_type = "REAL"
+        elif seen <= {dict, list}:
+            column_type = "JSONB"
+        else:
+            column_type = "TEXT"
+        column_types[column] = column_type
+    return column_types
+
+
+# =============== VALIDACIÓN / CONVERSIÓN ===============
+def _family(column_type):
+    """Familia de un tipo de PostgreSQL para validar valores de JSON (None = sin revisar)"""
+    if column_type in ("integer", "bigint", "smallint"):
+        return "integer"
+    if column_type in ("real", "double precision") or column_type.startswith("numeric"):
+        return "float"
+    if column_type == "boolean":
+        return "boolean"
+    if column_type == "text" or column_type.startswith("character"):
+        return "text"
+    return None
+
+# ===== Tipos de Python que cada familia acepta sin conversión
+_ACCEPTED = {
+    "integer": {int},
+    "float": {int, float},
+    "boolean": {bool},
+    "text": {str},
+}
+
+
+def _convert(family, values):
+    """
+    Convierte (vectorizado con pandas) los valores que no traen el tipo de la columna
+
+    Returns:
+        tuple: (lista con los valores convertidos, pd.Series bool de los válidos)
+    """
+    if family in ("integer", "float"):
+        numbers = pd.to_numeric(values.where(values.map(type).isin((str, int, float))), errors="coerce")
+        valid = numbers.notna()
+        if family == "integer":
+            valid &= numbers % 1 == 0
+            return (numbers.astype("int64").tolist() if valid.all() else []), valid
+        return numbers.astype("float64").tolist(), valid
+
+    if family == "boolean":
+        booleans = values.astype(str).str.strip().str.lower().map(_BOOLEAN_TEXT)
+        return booleans.tolist(), booleans.notna()
+
+    # text: JSON para objetos/listas/booleanos, texto para números
+    text = values.map(lambda value: json.dumps(value) if isinstance(value, (dict, list, bool)) else str(value))
+    return text.tolist(), pd.Series(True, index=values.index)
+
+
+def coerce_batch(records, column_types):
+    """
+    Valida el lote contra las columnas de la tabla y convierte en su lugar los
+    valores con tipo distinto (ej. '18' en una columna integer). Se revisa por
+    columna: si todos los valores ya traen el tipo correcto no se hace nada más.
+
+    Args:
+        records (list): Registros del lote (se modifican en su lugar)
+        column_types (dict): {columna: tipo} del SchemaRegistry
+
+    Raises:
+        SchemaError: Columnas inexistentes o valores que no se pueden convertir
+    """
+    columns = dict.fromkeys(key for record in records for key in record)
+    unknown = [column for column in columns if column not in column_types]
+    if unknown:
+        raise SchemaError(f"Columnas no existentes en la tabla: {', '.join(unknown)}")
+
+    for column in columns:
+        family = _family(column_types[column])
+        if family is None:
+            continue
+
+        values = [record.get(column) for record in records]
+        if set(map(type, values)) - {type(None)} <= _ACCEPTED[family]:
+            continue
+
+        # ===== Solo se convierten las posiciones con un tipo distinto
+        positions = [
+            index for index, value in enumerate(values)
+            if value is not None and type(value) not in _ACCEPTED[family]
+        ]
+        mismatched = pd.Series([values[index] for index in positions], index=positions, dtype=object)
+        converted, valid = _convert(family, mismatched)
+
+        if not valid.all():
+            index = valid.idxmin()
+            raise SchemaError(
+                f"Valor no válido para la columna '{column}' ({column_types[column]}) "
+                f"en el registro {index}: {values[index]!r}"
+            )
+        for index, value in zip(positions, converted):
+            records[index][column] = value
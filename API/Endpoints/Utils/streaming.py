@@ -0,0 +1,52 @@
+import traceback
+from flask import Response
+from .encoder import dumps
+
+# ===== Filas pedidas a la BD por cada ida (cursor del servidor / batch de Mongo)
+STREAM_BATCH_SIZE = 2000
+
+# ===== Formatos de salida en streaming
+STREAM_FORMATS = ("ndjson", "json-stream")
+
+
+def _ndjson(rows, encode):
+    """Una fila por línea; si algo falla a la mitad se emite una última línea de error"""
+    try:
+        for row in rows:
+            yield encode(row) + b"\n"
+    except Exception:
+        yield dumps({"status": "error", "info": traceback.format_exc().splitlines()}) + b"\n"
+
+
+def _json_stream(envelope, rows, encode):
+    """
+    Arreglo JSON en pedazos con el mismo sobre que la respuesta normal.
+    'count' va al final porque solo se conoce al terminar de leer.
+    """
+    head = dumps(envelope)[:-1]
+    yield head + (b", " if envelope else b"") + b'"data": ['
+
+    count = 0
+    try:
+        for row in rows:
+            yield (b"," if count else b"") + encode(row)
+            count += 1
+        yield f'], "count": {count}}}'.encode()
+    except Exception:
+        error = dumps(traceback.format_exc().splitlines())
+        yield f'], "count": {count}, "error": '.encode() + error + b"}"
+
+
+def stream_response(rows, output_format, envelope=None, encode=dumps):
+    """
+    Crea una respuesta Flask que escribe las filas conforme se leen de la BD
+
+    Args:
+        rows (iterable): Generador de diccionarios serializables
+        output_format (str): 'ndjson' o 'json-stream'
+        envelope (dict): Campos del sobre para 'json-stream' (status, table, ...)
+        encode (callable): Fila -> bytes JSON (ej. bson_to_json para documentos BSON crudos)
+    """
+    if output_format == "ndjson":
+        return Response(_ndjson(rows, encode), mimetype="application/x-ndjson")
+    return Response(_json_stream(envelope or {}, rows, encode), mimetype="application/json")
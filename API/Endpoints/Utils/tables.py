@@ -1,9 +1,51 @@
-import traceback, json
-from flask import current_app, request
+import traceback, json, time
+from flask import current_app, request, Response
 from flask_restful import Resource
 from contextlib import closing
 from datetime import datetime
+from uuid import uuid4
+from psycopg2.extras import execute_values, Json
+from psycopg2.extensions import AsIs
+from psycopg2.errors import UniqueViolation, UndefinedTable, UndefinedColumn
 from werkzeug.datastructures import ImmutableMultiDict
+from .hooks import notify_write
+from .cache import cached_response, arg_dependency
+from . import rollups, versions
+from .filters import sql_condition, sql_filters, split_key, filters_to_args, parse_fields, encode_cursor, decode_cursor, FilterError
+from .encoder import dumps
+from .schema import schema_registry, infer_column_types, coerce_batch, SchemaError
+from .streaming import stream_response, STREAM_BATCH_SIZE, STREAM_FORMATS
+from .columnar import columnar_response, ColumnarUnavailable, COLUMNAR_FORMATS
+from .indexes import filter_usage
+
+# ===== Filas por página en paginación keyset cuando no se indica 'limit'
+KEYSET_PAGE_SIZE = 1000
+
+# ===== Valor de un INSERT multi-fila para una columna que el registro no trae
+_DEFAULT = AsIs("DEFAULT")
+
+class _CopyStream:
+    """Objeto tipo archivo que alimenta COPY FROM STDIN desde un generador de líneas sin armar todo en memoria"""
+    def __init__(self, lines):
+        self._lines = iter(lines)
+        self._buffer = ""
+
+    def read(self, size=-1):
+        chunks = [self._buffer]
+        length = len(self._buffer)
+        while size < 0 or length < size:
+            try:
+                line = next(self._lines)
+            except StopIteration:
+                break
+            chunks.append(line)
+            length += len(line)
+        data = "".join(chunks)
+        if size < 0:
+            self._buffer = ""
+            return data
+        self._buffer = data[size:]
+        return data[:size]
 
 class PostgresTables(Resource):
     # =============== CONSTRUCTOR ===============
@@ -14,45 +56,260 @@ class PostgresTables(Resource):
 
 
     # =============== METODOS PRIVADOS ===============
-    def __serialize_value(self, value):
-        """Convierte valores no serializables a formatos compatibles con JSON"""
-        if isinstance(value, datetime):
-            return value.isoformat()
-        elif isinstance(value, (dict, list)):
-            return value  # Ya se manejará con json.dumps
+    def __serialize_row(self, row, columns):
+        """
+        Convierte una fila de la base de datos a diccionario. Los valores se dejan
+        tal cual (datetime, Decimal, JSONB como dict/list): el encoder de la
+        respuesta los serializa de forma nativa, sin revisar celda por celda.
+        """
+        return dict(zip(columns, row))
+
+    def __create_table(self, cursor, table_name, column_types):
+        """Crea la tabla con un ID serial y los tipos inferidos del lote (ver infer_column_types)"""
+        column_definitions = [f"{column} {column_type}" for column, column_type in column_types.items()]
+
+        # Crear la tabla con un ID serial como clave primaria
+        create_table_query = f"""
+            CREATE TABLE {table_name} (
+                id SERIAL PRIMARY KEY,
+                {', '.join(column_definitions)},
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+        """
+        cursor.execute(create_table_query)
+
+        # Crear trigger para actualizar updated_at automáticamente
+        cursor.execute(f"""
+            CREATE OR REPLACE FUNCTION update_updated_at_column()
+            RETURNS TRIGGER AS $$
+            BEGIN
+                NEW.updated_at = CURRENT_TIMESTAMP;
+                RETURN NEW;
+            END;
+            $$ language 'plpgsql';
+        """)
+
+        cursor.execute(f"""
+            CREATE TRIGGER update_{table_name}_updated_at
+                BEFORE UPDATE ON {table_name}
+                FOR EACH ROW
+                EXECUTE FUNCTION update_updated_at_column();
+        """)
+
+    def __copy_value(self, value):
+        """Convierte un valor al formato de texto de COPY (escapando separadores)"""
+        if value is None:
+            return "\\N"
+        if isinstance(value, bool):
+            return "t" if value else "f"
+        if isinstance(value, (dict, list)):
+            value = json.dumps(value)
+        elif isinstance(value, datetime):
+            value = value.isoformat()
         else:
-            return value
+            value = str(value)
+        return (value
+                .replace("\\", "\\\\")
+                .replace("\t", "\\t")
+                .replace("\n", "\\n")
+                .replace("\r", "\\r"))
 
-    def __serialize_row(self, row, columns):
-        """Convierte una fila de la base de datos a un diccionario serializable"""
-        row_dict = {}
-        for i, value in enumerate(row):
-            serialized_value = self.__serialize_value(value)
-            # Manejar tipos especiales
-            if isinstance(serialized_value, (dict, list)):
-                row_dict[columns[i]] = json.dumps(serialized_value)
-            else:
-                row_dict[columns[i]] = serialized_value
-        return row_dict
+    def __column_groups(self, data_list):
+        """Registros agrupados por su conjunto de columnas: [(columnas, registros)] en orden de aparición"""
+        groups = {}
+        for record in data_list:
+            groups.setdefault(frozenset(record), (list(record), []))[1].append(record)
+        return list(groups.values())
+
+    def __bulk_insert(self, cursor, table_name, data_list, return_mode, batch_size):
+        """
+        Inserta un lote completo en pocas idas a la base de datos
+
+        Args:
+            cursor: Cursor abierto dentro de la transacción del POST
+            table_name (str): Tabla destino
+            data_list (list): Registros a insertar
+            return_mode (str): 'none' usa COPY FROM STDIN sin devolver filas,
+                'ids' y 'rows' usan INSERT multi-fila con RETURNING
+            batch_size (int): Registros por sentencia INSERT multi-fila
+
+        Returns:
+            tuple: (cantidad_insertada, registros_devueltos)
+        """
+        # ===== COPY por cada grupo de registros con las mismas columnas: una columna
+        #       que falta en un registro toma su DEFAULT en lugar de NULL
+        if return_mode == "none":
+            inserted_count = 0
+            for columns, records in self.__column_groups(data_list):
+                lines = (
+                    "\t".join(self.__copy_value(record.get(column)) for column in columns) + "\n"
+                    for record in records
+                )
+                cursor.copy_expert(
+                    f"COPY {table_name} ({', '.join(columns)}) FROM STDIN",
+                    _CopyStream(lines)
+                )
+                inserted_count += cursor.rowcount
+            return inserted_count, []
+
+        # ===== Unión de columnas en orden de aparición (las faltantes van como DEFAULT,
+        #       así RETURNING conserva el orden del lote)
+        columns = list(dict.fromkeys(key for record in data_list for key in record))
+        rows = [
+            tuple(
+                Json(value) if isinstance(value, (dict, list)) else value
+                for value in (record.get(column, _DEFAULT) for column in columns)
+            )
+            for record in data_list
+        ]
+        returning = "id" if return_mode == "ids" else "*"
+        inserted_rows = execute_values(
+            cursor,
+            f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES %s RETURNING {returning}",
+            rows,
+            page_size=batch_size,
+            fetch=True
+        )
+
+        if return_mode == "ids":
+            return len(inserted_rows), [row[0] for row in inserted_rows]
+
+        column_names = [desc[0] for desc in cursor.description]
+        inserted_records = [self.__serialize_row(row, column_names) for row in inserted_rows]
+        return len(inserted_records), inserted_records
+
+    def __ensure_conflict_index(self, cursor, table_name, conflict_key):
+        """
+        ON CONFLICT necesita un índice único exactamente sobre la llave de conflicto;
+        se reutiliza uno existente (en cualquier orden de columnas) o se crea
+        """
+        cursor.execute("""
+            SELECT EXISTS (
+                SELECT FROM pg_index i
+                WHERE i.indrelid = %s::regclass
+                AND i.indisunique AND i.indpred IS NULL
+                AND ARRAY(
+                    SELECT a.attname::text FROM pg_attribute a
+                    WHERE a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+                    ORDER BY a.attname
+                ) = %s::text[]
+                AND i.indnkeyatts = %s
+            );
+        """, (table_name, sorted(conflict_key), len(conflict_key)))
+        if not cursor.fetchone()[0]:
+            cursor.execute(
+                f"CREATE UNIQUE INDEX {table_name}_{'_'.join(conflict_key)}_key "
+                f"ON {table_name} ({', '.join(conflict_key)})"
+            )
+
+    def __upsert(self, cursor, table_name, data_list, conflict_key, on_conflict, return_mode):
+        """
+        Inserta o actualiza el lote por la llave de conflicto en una sola sentencia:
+        COPY a una tabla temporal con los tipos de la tabla destino y después
+        INSERT ... SELECT ... ON CONFLICT. Las filas que ya tienen los mismos
+        valores no se reescriben, así reingestar los mismos datos no genera
+        filas muertas ni WAL.
+
+        Args:
+            cursor: Cursor abierto dentro de la transacción del POST
+            table_name (str): Tabla destino
+            data_list (list): Registros sin llaves repetidas
+            conflict_key (list): Columnas de la llave de conflicto
+            on_conflict (str): 'update' o 'nothing'
+            return_mode (str): 'none', 'ids' o 'rows'
+
+        Returns:
+            tuple: (insertados, actualizados, registros_devueltos)
+        """
+        # ===== Una sentencia por grupo de registros con las mismas columnas: una columna
+        #       que falta no se actualiza a NULL ni se inserta como NULL (toma su DEFAULT)
+        inserted_count, updated_count, returned = 0, 0, []
+        for columns, records in self.__column_groups(data_list):
+            inserted, updated, rows = self.__upsert_group(
+                cursor, table_name, columns, records, conflict_key, on_conflict, return_mode
+            )
+            inserted_count += inserted
+            updated_count += updated
+            returned.extend(rows)
+        return inserted_count, updated_count, returned
+
+    def __upsert_group(self, cursor, table_name, columns, data_list, conflict_key, on_conflict, return_mode):
+        """Upsert de registros que traen exactamente las mismas 'columns' (ver __upsert)"""
+        staging = f"_upsert_{uuid4().hex}"
 
-    def __create_args_from_params(self, table_name, filters=None, limit=None, offset=None):
+        # ===== Tabla temporal con los mismos tipos (sin restricciones), se borra al confirmar
+        cursor.execute(f"""
+            CREATE TEMP TABLE {staging} ON COMMIT DROP AS
+            SELECT {', '.join(columns)} FROM {table_name} WITH NO DATA
+        """)
+        lines = (
+            "\t".join(self.__copy_value(record.get(column)) for column in columns) + "\n"
+            for record in data_list
+        )
+        cursor.copy_expert(f"COPY {staging} ({', '.join(columns)}) FROM STDIN", _CopyStream(lines))
+
+        # ===== Solo se actualizan las filas con algún valor distinto
+        update_columns = [column for column in columns if column not in conflict_key]
+        if on_conflict == "update" and update_columns:
+            target = ", ".join(update_columns)
+            excluded = ", ".join(f"EXCLUDED.{column}" for column in update_columns)
+            action = (
+                f"DO UPDATE SET ({target}) = ROW({excluded}) "
+                f"WHERE ({', '.join(f'{table_name}.{column}' for column in update_columns)}) "
+                f"IS DISTINCT FROM ({excluded})"
+            )
+        else:
+            action = "DO NOTHING"
+
+        # ===== xmax = 0 distingue las filas nuevas de las actualizadas
+        returning = {"none": "", "ids": ", id", "rows": f", {table_name}.*"}[return_mode]
+        cursor.execute(f"""
+            INSERT INTO {table_name} ({', '.join(columns)})
+            SELECT {', '.join(columns)} FROM {staging}
+            ON CONFLICT ({', '.join(conflict_key)}) {action}
+            RETURNING (xmax = 0) AS inserted{returning}
+        """)
+        rows = cursor.fetchall()
+        inserted_count = sum(1 for row in rows if row[0])
+        updated_count = len(rows) - inserted_count
+
+        if return_mode == "ids":
+            return inserted_count, updated_count, [row[1] for row in rows]
+        if return_mode == "rows":
+            column_names = [desc[0] for desc in cursor.description][1:]
+            return inserted_count, updated_count, [self.__serialize_row(row[1:], column_names) for row in rows]
+        return inserted_count, updated_count, []
+
+    def __create_args_from_params(self, table_name, filters=None, limit=None, offset=None, fields=None, next_token=None, output_format=None, mode=None):
         """
         Crea un ImmutableMultiDict desde parámetros de función
+
+        Args:
+            filters (dict): Filtros, ej: {'country': 'Mexico', 'age': {'gte': 18, 'lt': 26}}
+            fields (list): Columnas a regresar, ej: ['user_id', 'age']
+            next_token (str): Paginación keyset; '' para la primera página o el 'next' de la respuesta anterior
+            output_format (str): 'json' (por defecto), 'ndjson', 'json-stream', 'arrow', 'parquet' o 'csv'
+            mode (str): 'rows' (por defecto), 'count' o 'exists'
         """
         args_list = [('table', table_name)]
         
         if filters:
-            for key, value in filters.items():
-                if isinstance(value, list):
-                    for v in value:
-                        args_list.append((key, str(v)))
-                else:
-                    args_list.append((key, str(value)))
+            args_list.extend(filters_to_args(filters))
+
+        for field in fields or []:
+            args_list.append(('fields', field))
         
         if limit:
             args_list.append(('limit', str(limit)))
         if offset:
             args_list.append(('offset', str(offset)))
+        if next_token is not None:
+            args_list.append(('next', next_token))
+        if output_format:
+            args_list.append(('format', output_format))
+        if mode:
+            args_list.append(('mode', mode))
         
         return ImmutableMultiDict(args_list)
 
@@ -74,6 +331,7 @@ class PostgresTables(Resource):
         params = []
         limit = None
         offset = None
+        options = {"format": "json", "fields": [], "next": None, "mode": "rows", "filter_columns": []}
         
         # Obtener todos los argumentos únicos (sin duplicados de keys)
         processed_keys = set()
@@ -84,84 +342,251 @@ class PostgresTables(Resource):
                 
             processed_keys.add(key)
             
-            if key in ["table", "limit", "offset"]:
+            if key in ["table", "limit", "offset", "format", "fields", "next", "mode"]:
                 if key == "limit":
                     limit_value = args_source.get("limit")
                     limit = int(limit_value) if limit_value and limit_value.isdigit() else None
                 elif key == "offset":
                     offset_value = args_source.get("offset")
                     offset = int(offset_value) if offset_value and offset_value.isdigit() else None
+                elif key == "format":
+                    options["format"] = args_source.get("format")
+                    if options["format"] not in ("json",) + STREAM_FORMATS + COLUMNAR_FORMATS:
+                        return None, {
+                            "status": "error",
+                            "info": f"Formato no soportado: '{options['format']}'. Usa 'json', 'ndjson', 'json-stream', 'arrow', 'parquet' o 'csv'"
+                        }, 400
+                elif key == "fields":
+                    try:
+                        options["fields"] = parse_fields(args_source.getlist("fields"))
+                    except FilterError as ex:
+                        return None, {
+                            "status": "error",
+                            "info": f"Proyección no válida: {ex}"
+                        }, 400
+                elif key == "next":
+                    try:
+                        options["next"] = decode_cursor(args_source.get("next")) if args_source.get("next") else ""
+                    except FilterError as ex:
+                        return None, {"status": "error", "info": str(ex)}, 400
+                elif key == "mode":
+                    options["mode"] = args_source.get("mode")
+                    if options["mode"] not in ("rows", "count", "exists"):
+                        return None, {
+                            "status": "error",
+                            "info": f"Modo no soportado: '{options['mode']}'. Usa 'rows', 'count' o 'exists'"
+                        }, 400
                 continue
             
-            # Obtener todos los valores para esta clave
+            # Obtener todos los valores para esta clave y compilar el filtro
+            # (igualdad, IN u operadores como 'campo__gte')
             values = args_source.getlist(key)
             
-            if len(values) == 1:
-                # Un solo valor - condición de igualdad
-                where_conditions.append(f"{key} = %s")
-                value = values[0]
-                # Conversión básica de tipos
-                if value.lower() == "true":
-                    params.append(True)
-                elif value.lower() == "false":
-                    params.append(False)
-                elif value.isdigit():
-                    params.append(int(value))
-                else:
-                    params.append(value)
-            else:
-                # Múltiples valores - usar operador IN
-                placeholders = ", ".join(["%s"] * len(values))
-                where_conditions.append(f"{key} IN ({placeholders})")
-                
-                # Convertir todos los valores y agregarlos a params
-                for value in values:
-                    if value.lower() == "true":
-                        params.append(True)
-                    elif value.lower() == "false":
-                        params.append(False)
-                    elif value.isdigit():
-                        params.append(int(value))
-                    else:
-                        params.append(value)
+            try:
+                condition, condition_params = sql_condition(key, values)
+            except FilterError as ex:
+                return None, {
+                    "status": "error",
+                    "info": f"Filtro no válido '{key}': {ex}"
+                }, 400
+
+            where_conditions.append(condition)
+            params.extend(condition_params)
+            options["filter_columns"].append(split_key(key)[0])
+
+        # ===== Paginación keyset: sustituye a offset y no aplica a los formatos en streaming
+        if options["next"] is not None and (offset or options["format"] != "json"):
+            return None, {
+                "status": "error",
+                "info": "El parámetro 'next' no se puede combinar con 'offset' ni con formatos en streaming"
+            }, 400
+
+        # ===== Conteo / existencia: solo regresan un número o un booleano, sin filas
+        if options["mode"] != "rows" and (options["format"] != "json" or options["next"] is not None):
+            return None, {
+                "status": "error",
+                "info": f"El modo '{options['mode']}' no se puede combinar con 'next' ni con otros formatos de salida"
+            }, 400
+
+        return (table_name, where_conditions, params, limit, offset, options), None, 200
+
+    def __stream_query(self, table_name, base_query, params, output_format):
+        """
+        Ejecuta la consulta con un cursor del lado del servidor (cursor con nombre)
+        y regresa una respuesta que escribe las filas por lotes, sin fetchall().
+        La conexión se mantiene prestada hasta que termina el streaming; también
+        se devuelve al cerrar la respuesta (call_on_close), aunque el cuerpo
+        nunca se haya leído (HEAD, cliente que se va antes del primer pedazo).
+        """
+        conn = self.get_connection()
+        try:
+            cursor = conn.cursor(name=f"stream_{uuid4().hex}")
+            cursor.itersize = STREAM_BATCH_SIZE
+            cursor.execute(base_query, params)
+        except Exception:
+            conn.close()
+            raise
+
+        def release():
+            if not conn.closed:
+                try:
+                    cursor.close()
+                finally:
+                    conn.close()
 
-        return (table_name, where_conditions, params, limit, offset), None, 200
+        def rows():
+            try:
+                columns = None
+                for row in cursor:
+                    # En cursores con nombre, description existe hasta el primer fetch
+                    if columns is None:
+                        columns = [desc[0] for desc in cursor.description]
+                    yield self.__serialize_row(row, columns)
+            finally:
+                release()
+
+        response = stream_response(rows(), output_format, envelope={
+            "status": "fetched",
+            "database": "postgresql",
+            "table": table_name
+        })
+        response.call_on_close(release)
+        return response
+
+    def __table_columns(self, table_name):
+        """Columnas reales de la tabla, en su orden (lista vacía si la tabla no existe)"""
+        columns = schema_registry.lookup(table_name)
+        if columns is None:
+            with closing(self.get_connection()) as conn:
+                with conn.cursor() as cursor:
+                    columns = schema_registry.columns(table_name, cursor)
+        return list(columns or [])
 
-    def __execute_query(self, table_name, where_conditions, params, limit, offset):
+    def __count_query(self, table_name, where_conditions, params, limit, offset, options):
+        """
+        SELECT count(*) / SELECT EXISTS con los mismos filtros, sin transferir filas.
+        Con limit u offset se cuenta lo que regresaría la consulta paginada.
+        """
+        where_clause = " WHERE " + " AND ".join(where_conditions) if where_conditions else ""
+        limit_clause = f" LIMIT {limit}" if limit else ""
+        offset_clause = f" OFFSET {offset}" if offset else ""
+
+        if options["mode"] == "exists":
+            query = f"SELECT EXISTS (SELECT 1 FROM {table_name}{where_clause}{offset_clause})"
+        elif limit or offset:
+            query = f"SELECT count(*) FROM (SELECT 1 FROM {table_name}{where_clause}{limit_clause}{offset_clause}) AS q"
+        else:
+            query = f"SELECT count(*) FROM {table_name}{where_clause}"
+
+        started = time.perf_counter()
+        with closing(self.get_connection()) as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(query, params)
+                (value,) = cursor.fetchone()
+        filter_usage.record("postgresql", table_name, options["filter_columns"], (time.perf_counter() - started) * 1000)
+
+        return {
+            "status": "fetched",
+            "database": "postgresql",
+            "table": table_name,
+            "mode": options["mode"],
+            options["mode"]: value
+        }, 200
+
+    def __execute_query(self, table_name, where_conditions, params, limit, offset, options):
         """
         Ejecuta la consulta en PostgreSQL
         """
         try:
+            # ===== Conteo / existencia
+            if options["mode"] != "rows":
+                return self.__count_query(table_name, where_conditions, params, limit, offset, options)
+
+            keyset = options["next"] is not None
+            fields = list(options["fields"])
+            columns = self.__table_columns(table_name) if fields or keyset else []
+
+            # ===== Paginación keyset: ordena por 'id' y continúa después de la última llave
+            if keyset:
+                if columns and "id" not in columns:
+                    return {
+                        "status": "error",
+                        "info": f"La tabla '{table_name}' no tiene columna 'id' para paginar con 'next'"
+                    }, 400
+                if fields and "id" not in fields:
+                    fields.insert(0, "id")
+                if options["next"] != "":
+                    where_conditions = where_conditions + ["id > %s"]
+                    params = params + [options["next"]]
+                limit = limit or KEYSET_PAGE_SIZE
+
+            # ===== Proyección: solo las columnas pedidas, validadas contra la tabla
+            select_list = "*"
+            if fields:
+                unknown = [field for field in fields if columns and field not in columns]
+                if unknown:
+                    return {
+                        "status": "error",
+                        "info": f"Columnas que no existen en '{table_name}': {', '.join(unknown)}"
+                    }, 400
+                select_list = ", ".join(fields)
+
             # ===== Construir query
-            base_query = f"SELECT * FROM {table_name}"
+            base_query = f"SELECT {select_list} FROM {table_name}"
             
             if where_conditions:
                 base_query += " WHERE " + " AND ".join(where_conditions)
+            if keyset:
+                base_query += " ORDER BY id"
             
             if limit:
                 base_query += f" LIMIT {limit}"
             if offset:
                 base_query += f" OFFSET {offset}"
 
+            # ===== Salida en streaming (NDJSON / arreglo JSON en pedazos)
+            # (en streaming solo se cuenta el uso del filtro, la latencia la marca el cliente)
+            if options["format"] in STREAM_FORMATS:
+                response = self.__stream_query(table_name, base_query, params, options["format"])
+                filter_usage.record("postgresql", table_name, options["filter_columns"])
+                return response
+
+            # ===== Salida por columnas (Arrow IPC / Parquet / CSV con COPY), también en streaming
+            if options["format"] in COLUMNAR_FORMATS:
+                try:
+                    response = columnar_response(self.get_connection, base_query, params, options["format"], table_name)
+                except ColumnarUnavailable as ex:
+                    return {"status": "error", "info": str(ex)}, 501
+                filter_usage.record("postgresql", table_name, options["filter_columns"])
+                return response
+
             # ===== Ejecutar consulta
+            started = time.perf_counter()
             with closing(self.get_connection()) as conn:
                 with conn.cursor() as cursor:
                     cursor.execute(base_query, params)
                     columns = [desc[0] for desc in cursor.description]
-                    rows = cursor.fetchall()
-                    
-                    # Convertir a diccionarios serializables
-                    results = []
-                    for row in rows:
-                        results.append(self.__serialize_row(row, columns))
+                    results = [self.__serialize_row(row, columns) for row in cursor.fetchall()]
+            filter_usage.record("postgresql", table_name, options["filter_columns"], (time.perf_counter() - started) * 1000)
 
-            return {
+            response = {
                 "status": "fetched",
                 "database": "postgresql",
                 "table": table_name,
                 "count": len(results),
                 "data": results
-            }, 200
+            }
+            if keyset:
+                # Página incompleta = ya no hay más filas
+                response["next"] = encode_cursor(results[-1]["id"]) if len(results) == limit else None
+            return response, 200
+
+        except (UndefinedTable, UndefinedColumn):
+            schema_registry.invalidate(table_name)
+            return {
+                "status": "error",
+                "info": traceback.format_exc().splitlines()
+            }, 500
 
         except Exception as e:
             return {
@@ -172,24 +597,165 @@ class PostgresTables(Resource):
     
     
     
+    def __batch_update(self, cursor, table_name, key_columns, set_columns, rows, column_types, batch_size):
+        """
+        Aplica muchos updates con la misma forma en pocas sentencias
+        UPDATE ... FROM (VALUES ...), uniendo por las columnas llave
+
+        Args:
+            key_columns (tuple): Columnas que identifican cada registro (igualdad)
+            set_columns (tuple): Columnas que se actualizan
+            rows (list): Tuplas con los valores de key_columns + set_columns
+            column_types (dict): Tipos de la tabla, para tipar los VALUES
+            batch_size (int): Filas de VALUES por sentencia
+
+        Returns:
+            int: Registros actualizados
+        """
+        columns = key_columns + set_columns
+        # ===== Los VALUES llegan como texto: se castean al tipo real de cada columna
+        template = "(" + ", ".join(f"%s::{column_types[column]}" for column in columns) + ")"
+        query = f"""
+            UPDATE {table_name} AS t
+            SET {", ".join(f"{column} = v.{column}" for column in set_columns)}
+            FROM (VALUES %s) AS v ({", ".join(columns)})
+            WHERE {" AND ".join(f"t.{column} = v.{column}" for column in key_columns)}
+        """
+        affected_rows = 0
+        for start in range(0, len(rows), batch_size):
+            chunk = rows[start:start + batch_size]
+            execute_values(cursor, query, chunk, template=template, page_size=len(chunk))
+            affected_rows += cursor.rowcount
+        return affected_rows
+
+    def __chunked_delete(self, table_name, where_clause, params, batch_size):
+        """
+        DELETE por lotes de 'batch_size' filas, cada uno en su propia transacción
+        (bloqueos cortos y WAL repartido). Responde en NDJSON una línea de progreso
+        por lote y al final el total; los rollups se recalculan una sola vez.
+        """
+        delete_query = f"""
+            DELETE FROM {table_name}
+            WHERE ctid = ANY(ARRAY(SELECT ctid FROM {table_name}{where_clause} LIMIT %s))
+        """
+
+        def refresh(conn):
+            with conn.cursor() as cursor:
+                rollups.refresh(cursor, table_name)
+                versions.bump_postgres(cursor, table_name)
+            conn.commit()
+            notify_write("postgresql", table_name)
+
+        conn = self.get_connection()
+        state = {"total": 0, "pending": False, "finished": False}
+
+        def finish():
+            """Cliente desconectado, cuerpo nunca leído o error: los lotes ya confirmados sí cuentan para los rollups"""
+            if state["finished"]:
+                return
+            state["finished"] = True
+            try:
+                if state["pending"]:
+                    conn.rollback()
+                    try:
+                        refresh(conn)
+                    except Exception:
+                        conn.rollback()
+            finally:
+                conn.close()
+
+        def progress():
+            try:
+                while True:
+                    with conn.cursor() as cursor:
+                        cursor.execute(delete_query, params + [batch_size])
+                        deleted = cursor.rowcount
+                        if deleted:
+                            versions.bump_postgres(cursor, table_name)
+                    conn.commit()
+                    if not deleted:
+                        break
+                    state["total"] += deleted
+                    state["pending"] = True
+                    notify_write("postgresql", table_name)
+                    yield dumps({"status": "progress", "deleted": deleted, "total": state["total"]}) + b"\n"
+
+                if state["pending"]:
+                    refresh(conn)
+                    state["pending"] = False
+                yield dumps({
+                    "status": "deleted",
+                    "database": "postgresql",
+                    "table": table_name,
+                    "info": f"Se eliminaron {state['total']} registros",
+                    "deleted_count": state["total"]
+                }) + b"\n"
+            except Exception:
+                yield dumps({"status": "error", "info": traceback.format_exc().splitlines()}) + b"\n"
+            finally:
+                finish()
+
+        response = Response(progress(), mimetype="application/x-ndjson")
+        # === Devuelve la conexión aunque el cuerpo nunca se lea (el finally del generador no corre si no arrancó)
+        response.call_on_close(finish)
+        return response
+
+    # =============== METODOS PUBLICOS ===============
+    def query(self, query, params=None):
+        """
+        Ejecuta una consulta SQL parametrizada desde código (JOINs, GROUP BY, etc.)
+        con una sola ida a la base de datos
+
+        Args:
+            query (str): Sentencia SELECT con placeholders %s
+            params (list): Parámetros de la sentencia
+
+        Returns:
+            tuple: (response_data, status_code) con el mismo formato que get()
+        """
+        try:
+            with closing(self.get_connection()) as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(query, params or [])
+                    columns = [desc[0] for desc in cursor.description]
+                    results = [self.__serialize_row(row, columns) for row in cursor.fetchall()]
+
+            return {
+                "status": "fetched",
+                "database": "postgresql",
+                "count": len(results),
+                "data": results
+            }, 200
+
+        except Exception:
+            return {
+                "status": "error",
+                "info": traceback.format_exc().splitlines()
+            }, 500
+
     # =============== METODOS HTTP ===============
-    def get(self, table_name=None, filters=None, limit=None, offset=None):
+    @cached_response(arg_dependency("postgresql", "table"))
+    def get(self, table_name=None, filters=None, limit=None, offset=None, fields=None, next_token=None, output_format=None, mode=None):
         """
         Endpoint HTTP o método directo
         
         Si se llama como endpoint HTTP: usa request.args
+            ej: ?table=users&fields=user_id,age&age__gte=18
+            ej: ?table=viewing_sessions&limit=500&next=   (después: &next=<next de la respuesta>)
         Si se pasan parámetros: los usa directamente
+            ej: get('users', filters={'age': {'gte': 18}}, fields=['user_id', 'age'])
+            ej: get('tech_salaries', output_format='arrow') -> Response con un stream Arrow IPC
+            ej: get('viewing_sessions', mode='count') -> {'count': ...} sin transferir filas
         """
         if table_name:
             # Llamada directa con parámetros
-            mock_args = self.__create_args_from_params(table_name, filters, limit, offset)
+            mock_args = self.__create_args_from_params(table_name, filters, limit, offset, fields, next_token, output_format, mode)
             parsed_data, error_response, status_code = self.__parse_args(mock_args)
             
             if error_response:
                 return error_response, status_code
             
-            table_name, where_conditions, params, limit, offset = parsed_data
-            return self.__execute_query(table_name, where_conditions, params, limit, offset)
+            return self.__execute_query(*parsed_data)
         else:
             # Llamada como endpoint HTTP
             parsed_data, error_response, status_code = self.__parse_args(request.args)
@@ -197,8 +763,7 @@ class PostgresTables(Resource):
             if error_response:
                 return error_response, status_code
             
-            table_name, where_conditions, params, limit, offset = parsed_data
-            return self.__execute_query(table_name, where_conditions, params, limit, offset)
+            return self.__execute_query(*parsed_data)
 
     def post(self):
         try:
@@ -206,6 +771,11 @@ class PostgresTables(Resource):
             payload = request.json
             table_name = payload.get("table")
             data = payload.get("data")
+            mode = payload.get("mode", "row")
+            return_mode = payload.get("return", "none" if mode in ("bulk", "upsert") else "rows")
+            batch_size = payload.get("batch_size", 5000)
+            conflict_key = payload.get("conflict_key")
+            on_conflict = payload.get("on_conflict", "update")
         
             # ===== Validaciones
             if not table_name:
@@ -219,6 +789,24 @@ class PostgresTables(Resource):
                     "status": "error",
                     "info": "Valida que se encuentre 'data' en el payload"
                 }, 400
+
+            if mode not in ("row", "bulk", "upsert"):
+                return {
+                    "status": "error",
+                    "info": "Valida que 'mode' sea 'row', 'bulk' o 'upsert'"
+                }, 400
+
+            if return_mode not in ("none", "ids", "rows"):
+                return {
+                    "status": "error",
+                    "info": "Valida que 'return' sea 'none', 'ids' o 'rows'"
+                }, 400
+
+            if not isinstance(batch_size, int) or isinstance(batch_size, bool) or batch_size < 1:
+                return {
+                    "status": "error",
+                    "info": "Valida que 'batch_size' sea un entero positivo"
+                }, 400
             
             # ===== Normalizar data a lista de diccionarios
             if isinstance(data, dict):
@@ -243,97 +831,165 @@ class PostgresTables(Resource):
                     "status": "error",
                     "info": "La lista 'data' no puede estar vacía"
                 }, 400
+
+            # ===== Upsert: llave de conflicto y registros únicos por llave
+            if mode == "upsert":
+                if isinstance(conflict_key, str):
+                    conflict_key = [conflict_key]
+                if not conflict_key or not isinstance(conflict_key, list) or not all(isinstance(key, str) and key for key in conflict_key):
+                    return {
+                        "status": "error",
+                        "info": "Valida que se encuentre 'conflict_key' (columna o lista de columnas) en el payload"
+                    }, 400
+
+                if on_conflict not in ("update", "nothing"):
+                    return {
+                        "status": "error",
+                        "info": "Valida que 'on_conflict' sea 'update' o 'nothing'"
+                    }, 400
+
+                if any(
+                    record.get(column) is None or isinstance(record.get(column), (dict, list))
+                    for record in data_list for column in conflict_key
+                ):
+                    return {
+                        "status": "error",
+                        "info": f"Todos los registros deben tener un valor simple (no nulo) en {conflict_key}"
+                    }, 400
             
             with closing(self.get_connection()) as conn:
                 with conn.cursor() as cursor:
-                    # ===== Verificar si la tabla existe
-                    cursor.execute("""
-                        SELECT EXISTS (
-                            SELECT FROM information_schema.tables 
-                            WHERE table_schema = 'public' 
-                            AND table_name = %s
-                        );
-                    """, (table_name,))
-                    table_exists = cursor.fetchone()[0]
+                    # ===== Verificar si la tabla existe (esquema en caché, sin ir al catálogo;
+                    #       se vuelve a leer si el lote trae columnas que la caché no conoce)
+                    column_types = schema_registry.columns(
+                        table_name, cursor, required=dict.fromkeys(key for record in data_list for key in record)
+                    )
+                    table_exists = column_types is not None
                     
-                    # ===== Si la tabla no existe, crearla basándose en el primer registro
+                    # ===== Si la tabla no existe, crearla con los tipos inferidos de una muestra del lote
                     if not table_exists:
-                        first_record = data_list[0]
-                        # Determinar tipos de datos para cada columna
-                        column_definitions = []
-                        for key, value in first_record.items():
-                            if isinstance(value, bool):
-                                column_type = "BOOLEAN"
-                            elif isinstance(value, int):
-                                column_type = "INTEGER"
-                            elif isinstance(value, float):
-                                column_type = "REAL"
-                            elif isinstance(value, (dict, list)):
-                                column_type = "JSONB"
-                            else:
-                                column_type = "TEXT"
-                            
-                            column_definitions.append(f"{key} {column_type}")
-                        
-                        # Crear la tabla con un ID serial como clave primaria
-                        create_table_query = f"""
-                            CREATE TABLE {table_name} (
-                                id SERIAL PRIMARY KEY,
-                                {', '.join(column_definitions)},
-                                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                            );
-                        """
-                        cursor.execute(create_table_query)
-                        
-                        # Crear trigger para actualizar updated_at automáticamente
-                        cursor.execute(f"""
-                            CREATE OR REPLACE FUNCTION update_updated_at_column()
-                            RETURNS TRIGGER AS $$
-                            BEGIN
-                                NEW.updated_at = CURRENT_TIMESTAMP;
-                                RETURN NEW;
-                            END;
-                            $$ language 'plpgsql';
-                        """)
-                        
-                        cursor.execute(f"""
-                            CREATE TRIGGER update_{table_name}_updated_at
-                                BEFORE UPDATE ON {table_name}
-                                FOR EACH ROW
-                                EXECUTE FUNCTION update_updated_at_column();
-                        """)
+                        inferred_types = infer_column_types(data_list)
+                        self.__create_table(cursor, table_name, inferred_types)
+                        column_types = {column: column_type.lower() for column, column_type in inferred_types.items()}
+                        # Columnas que agrega __create_table por su cuenta
+                        column_types.update({
+                            "id": "integer",
+                            "created_at": "timestamp without time zone",
+                            "updated_at": "timestamp without time zone",
+                        })
+
+                    # ===== return=ids necesita la columna 'id' (las tablas que crea la API la tienen)
+                    if return_mode == "ids" and "id" not in column_types:
+                        return {
+                            "status": "error",
+                            "info": f"La tabla '{table_name}' no tiene columna 'id'; usa 'return': 'rows' o 'none'"
+                        }, 400
+
+                    # ===== Validar / convertir el lote contra los tipos de la tabla
+                    coerce_batch(data_list, column_types)
+
+                    # ===== Upsert: el último registro de cada llave gana (ON CONFLICT no acepta llaves repetidas)
+                    if mode == "upsert":
+                        unique_records = {}
+                        for record in data_list:
+                            key = tuple(record[column] for column in conflict_key)
+                            unique_records.pop(key, None)
+                            unique_records[key] = record
+                        duplicates = len(data_list) - len(unique_records)
+                        data_list = list(unique_records.values())
+
+                    # ===== Upsert por la llave de conflicto (los rollups se recalculan si algo cambió)
+                    if mode == "upsert":
+                        try:
+                            self.__ensure_conflict_index(cursor, table_name, conflict_key)
+                        except UniqueViolation:
+                            conn.rollback()
+                            return {
+                                "status": "error",
+                                "info": f"La tabla '{table_name}' ya tiene registros repetidos en {conflict_key}; no se puede usar como llave de conflicto"
+                            }, 409
+
+                        inserted_count, updated_count, inserted_records = self.__upsert(
+                            cursor, table_name, data_list, conflict_key, on_conflict, return_mode
+                        )
+                        if inserted_count or updated_count:
+                            rollups.refresh(cursor, table_name)
+                            versions.bump_postgres(cursor, table_name)
+
+                    else:
+                        # ===== Sumar el lote a los rollups y la versión de la tabla en la misma transacción
+                        rollups.apply_insert(cursor, table_name, data_list)
+                        versions.bump_postgres(cursor, table_name)
                     
-                    # ===== Insertar múltiples registros
-                    inserted_records = []
+                    # ===== Inserción masiva (COPY / execute_values)
+                    if mode == "bulk":
+                        inserted_count, inserted_records = self.__bulk_insert(
+                            cursor, table_name, data_list, return_mode, batch_size
+                        )
                     
-                    for record in data_list:
-                        # ===== Construir query INSERT para cada registro
-                        columns = list(record.keys())
-                        values = list(record.values())
-                        placeholders = ", ".join(["%s"] * len(values))
+                    # ===== Insertar registro por registro
+                    elif mode == "row":
+                        inserted_records = []
+                    
+                        for record in data_list:
+                            # ===== Construir query INSERT para cada registro
+                            columns = list(record.keys())
+                            values = [Json(value) if isinstance(value, (dict, list)) else value for value in record.values()]
+                            placeholders = ", ".join(["%s"] * len(values))
                         
-                        insert_query = f"""
-                            INSERT INTO {table_name} ({", ".join(columns)}) 
-                            VALUES ({placeholders}) 
-                            RETURNING *
-                        """
+                            insert_query = f"""
+                                INSERT INTO {table_name} ({", ".join(columns)}) 
+                                VALUES ({placeholders}) 
+                                RETURNING *
+                            """
                         
-                        # ===== Ejecutar inserción
-                        cursor.execute(insert_query, values)
-                        inserted_row = cursor.fetchone()
-                        column_names = [desc[0] for desc in cursor.description]
+                            # ===== Ejecutar inserción
+                            cursor.execute(insert_query, values)
+                            inserted_row = cursor.fetchone()
+                            column_names = [desc[0] for desc in cursor.description]
                         
-                        # Convertir a diccionario serializable
-                        result_dict = {}
-                        if inserted_row:
-                            for i, value in enumerate(inserted_row):
-                                result_dict[column_names[i]] = self.__serialize_value(value)
-                            inserted_records.append(result_dict)
+                            # Convertir a diccionario serializable
+                            if inserted_row:
+                                inserted_records.append(self.__serialize_row(inserted_row, column_names))
+                        inserted_count = len(inserted_records)
                 
                 conn.commit()
+            notify_write("postgresql", table_name)
             
             action = "created_table_and_inserted" if not table_exists else "inserted"
+
+            # ===== Respuesta del upsert
+            if mode == "upsert":
+                unchanged_count = len(data_list) - inserted_count - updated_count
+                response = {
+                    "status": "success",
+                    "database": "postgresql",
+                    "table": table_name,
+                    "action": "created_table_and_upserted" if not table_exists else "upserted",
+                    "info": f"Tabla '{table_name}' {'creada e ' if not table_exists else ''}{inserted_count} registros insertados, {updated_count} actualizados y {unchanged_count} sin cambios",
+                    "count": inserted_count + updated_count,
+                    "inserted": inserted_count,
+                    "updated": updated_count,
+                    "unchanged": unchanged_count,
+                    "duplicates": duplicates
+                }
+                if return_mode != "none":
+                    response["data"] = inserted_records
+                return response, 201 if inserted_count else 200
+
+            # ===== Respuesta del modo masivo
+            if mode == "bulk":
+                response = {
+                    "status": "success",
+                    "database": "postgresql",
+                    "table": table_name,
+                    "action": action,
+                    "info": f"Tabla '{table_name}' {'creada e ' if not table_exists else ''}{inserted_count} registros insertados",
+                    "count": inserted_count
+                }
+                if return_mode != "none":
+                    response["data"] = inserted_records
+                return response, 201
             
             # ===== Preparar respuesta según si fue un registro o múltiples
             if len(inserted_records) == 1:
@@ -355,7 +1011,18 @@ class PostgresTables(Resource):
                     "count": len(inserted_records),
                     "data": inserted_records
                 }, 201
-        
+
+        except SchemaError as ex:
+            return {"status": "error", "info": str(ex)}, 400
+
+        # ===== Esquema en caché desactualizado (DDL hecha fuera de la API): se vuelve a leer en el siguiente request
+        except (UndefinedTable, UndefinedColumn):
+            schema_registry.invalidate(table_name)
+            return {
+                "status": "error", 
+                "info": traceback.format_exc().splitlines()
+            }, 500
+
         # ===== Manejo de errores
         except Exception:
             return {
@@ -370,6 +1037,9 @@ class PostgresTables(Resource):
             table_name = payload.get("table")
             filters = payload.get("filters", {})
             data = payload.get("data")
+            updates = payload.get("updates")
+            key = payload.get("key")
+            batch_size = payload.get("batch_size", 5000)
 
             # ===== Validaciones
             if not table_name:
@@ -378,44 +1048,132 @@ class PostgresTables(Resource):
                     "info": "Valida que se encuentre 'table' en el payload"
                 }, 400
 
-            if not filters:
+            if not isinstance(batch_size, int) or isinstance(batch_size, bool) or batch_size < 1:
                 return {
-                    "status": "error", 
-                    "info": "Valida que se encuentren 'filters' en el payload para identificar registros"
+                    "status": "error",
+                    "info": "Valida que 'batch_size' sea un entero positivo"
                 }, 400
 
-            if not data or not isinstance(data, dict):
-                return {
-                    "status": "error", 
-                    "info": "Valida que se encuentre 'data' como objeto en el payload"
-                }, 400
+            # ===== Lote de pares: {"updates": [{"filters": {...}, "data": {...}}, ...]}
+            if updates is not None:
+                if not isinstance(updates, list) or not updates or not all(
+                    isinstance(update, dict)
+                    and isinstance(update.get("filters"), dict) and update.get("filters")
+                    and isinstance(update.get("data"), dict) and update.get("data")
+                    for update in updates
+                ):
+                    return {
+                        "status": "error",
+                        "info": "Valida que 'updates' sea una lista de objetos con 'filters' y 'data'"
+                    }, 400
+                pairs = [(update["filters"], update["data"]) for update in updates]
 
-            # ===== Construir query UPDATE
-            set_clauses = []
-            where_clauses = []
-            params = []
-            
-            # Campos a actualizar
-            for key, value in data.items():
-                set_clauses.append(f"{key} = %s")
-                params.append(value)
-            
-            # Condiciones WHERE
-            for key, value in filters.items():
-                where_clauses.append(f"{key} = %s")
-                params.append(value)
-            
-            update_query = f"""
-                UPDATE {table_name} 
-                SET {", ".join(set_clauses)} 
-                WHERE {" AND ".join(where_clauses)}
-            """
-            
-            # ===== Ejecutar consulta
+            # ===== Lista con llave: {"key": "user_id", "data": [{"user_id": ..., "age": ...}, ...]}
+            elif key is not None:
+                key_columns = [key] if isinstance(key, str) else key
+                if not key_columns or not isinstance(key_columns, list) or not all(isinstance(column, str) and column for column in key_columns):
+                    return {
+                        "status": "error",
+                        "info": "Valida que 'key' sea una columna o una lista de columnas"
+                    }, 400
+
+                if not isinstance(data, list) or not data or not all(isinstance(record, dict) for record in data):
+                    return {
+                        "status": "error",
+                        "info": "Valida que 'data' sea una lista de objetos cuando se usa 'key'"
+                    }, 400
+
+                pairs = []
+                for record in data:
+                    record_data = {column: value for column, value in record.items() if column not in key_columns}
+                    if any(record.get(column) is None for column in key_columns) or not record_data:
+                        return {
+                            "status": "error",
+                            "info": f"Cada registro de 'data' debe tener valor en {key_columns} y al menos una columna a actualizar"
+                        }, 400
+                    pairs.append(({column: record[column] for column in key_columns}, record_data))
+
+            # ===== Un solo update
+            else:
+                if not filters:
+                    return {
+                        "status": "error", 
+                        "info": "Valida que se encuentren 'filters' en el payload para identificar registros"
+                    }, 400
+
+                if not data or not isinstance(data, dict):
+                    return {
+                        "status": "error", 
+                        "info": "Valida que se encuentre 'data' como objeto en el payload"
+                    }, 400
+                pairs = [(filters, data)]
+
+            # ===== Ejecutar todo en una transacción
             with closing(self.get_connection()) as conn:
                 with conn.cursor() as cursor:
-                    cursor.execute(update_query, params)
-                    affected_rows = cursor.rowcount
+                    # Solo las llaves de los filtros llevan operador ('age__gt'); las de 'data' son columnas tal cual
+                    referenced = {
+                        split_key(column)[0] for pair_filters, _ in pairs for column in pair_filters
+                    } | {column for _, pair_data in pairs for column in pair_data}
+                    column_types = schema_registry.columns(table_name, cursor, required=referenced)
+                    if column_types is None:
+                        return {
+                            "status": "error",
+                            "info": f"La tabla '{table_name}' no existe"
+                        }, 404
+                    unknown = sorted(referenced - set(column_types))
+                    if unknown:
+                        return {
+                            "status": "error",
+                            "info": f"Columnas no existentes en '{table_name}': {', '.join(unknown)}"
+                        }, 400
+
+                    affected_rows, statements = 0, 0
+                    run_shape, run_rows = None, {}
+
+                    def flush_run():
+                        # Un tramo de updates con la misma forma va en UPDATE ... FROM (VALUES ...)
+                        nonlocal affected_rows, statements
+                        if run_rows:
+                            affected_rows += self.__batch_update(
+                                cursor, table_name, *run_shape, list(run_rows.values()), column_types, batch_size
+                            )
+                            statements += (len(run_rows) + batch_size - 1) // batch_size
+                            run_rows.clear()
+
+                    for pair_filters, pair_data in pairs:
+                        values = [Json(value) if isinstance(value, (dict, list)) else value for value in pair_data.values()]
+
+                        # ===== Igualdad simple: se acumula en el tramo actual (gana el último por llave)
+                        if len(pairs) > 1 and all(
+                            split_key(column)[1] is None and isinstance(value, (str, int, float, bool))
+                            for column, value in pair_filters.items()
+                        ):
+                            shape = (tuple(pair_filters), tuple(pair_data))
+                            if shape != run_shape:
+                                flush_run()
+                                run_shape = shape
+                            filter_values = tuple(pair_filters.values())
+                            run_rows.pop(filter_values, None)
+                            run_rows[filter_values] = filter_values + tuple(values)
+                            continue
+
+                        # ===== Operadores (o un solo update): UPDATE con el lenguaje de filtros
+                        flush_run()
+                        run_shape = None
+                        where_clauses, params = sql_filters(pair_filters)
+                        cursor.execute(f"""
+                            UPDATE {table_name} 
+                            SET {", ".join(f"{column} = %s" for column in pair_data)} 
+                            WHERE {" AND ".join(where_clauses)}
+                        """, values + params)
+                        affected_rows += cursor.rowcount
+                        statements += 1
+                    flush_run()
+
+                    if affected_rows:
+                        rollups.refresh(cursor, table_name, {column for _, pair_data in pairs for column in pair_data})
+                        versions.bump_postgres(cursor, table_name)
                 conn.commit()
             
             if affected_rows == 0:
@@ -423,15 +1181,31 @@ class PostgresTables(Resource):
                     "status": "error",
                     "info": "No se encontraron registros que coincidan con los filtros"
                 }, 404
+            notify_write("postgresql", table_name)
             
-            return {
+            response = {
                 "status": "updated", 
                 "database": "postgresql",
                 "table": table_name,
                 "info": f"Se actualizaron {affected_rows} registros",
                 "affected_rows": affected_rows
-            }, 200
+            }
+            if len(pairs) > 1:
+                response["updates"] = len(pairs)
+                response["statements"] = statements
+            return response, 200
+
+        except FilterError as ex:
+            return {"status": "error", "info": str(ex)}, 400
         
+        # ===== Esquema en caché desactualizado (DDL hecha fuera de la API): se vuelve a leer en el siguiente request
+        except (UndefinedTable, UndefinedColumn):
+            schema_registry.invalidate(table_name)
+            return {
+                "status": "error", 
+                "info": traceback.format_exc().splitlines()
+            }, 500
+
         # ===== Manejo de errores
         except Exception:
             return {
@@ -445,6 +1219,8 @@ class PostgresTables(Resource):
             payload = request.json
             table_name = payload.get("table")
             filters = payload.get("filters")
+            mode = payload.get("mode", "single")
+            batch_size = payload.get("batch_size", 10000)
 
             # ===== Validaciones
             if not table_name:
@@ -453,26 +1229,59 @@ class PostgresTables(Resource):
                     "info": "Valida que se encuentre 'table' en el payload"
                 }, 400
 
-            # ===== Eliminar toda la tabla si no hay filtros
-            if not filters:
-                delete_query = f"DELETE FROM {table_name}"
-                params = []
-            else:
-                # ===== Eliminar registros específicos
-                where_clauses = []
-                params = []
-                
-                for key, value in filters.items():
-                    where_clauses.append(f"{key} = %s")
-                    params.append(value)
-                
-                delete_query = f"DELETE FROM {table_name} WHERE {' AND '.join(where_clauses)}"
+            if mode not in ("single", "chunked", "truncate"):
+                return {
+                    "status": "error",
+                    "info": "Valida que 'mode' sea 'single', 'chunked' o 'truncate'"
+                }, 400
+
+            if not isinstance(batch_size, int) or isinstance(batch_size, bool) or batch_size < 1:
+                return {
+                    "status": "error",
+                    "info": "Valida que 'batch_size' sea un entero positivo"
+                }, 400
+
+            if mode == "truncate" and filters:
+                return {
+                    "status": "error",
+                    "info": "El modo 'truncate' vacía toda la tabla y no acepta 'filters'"
+                }, 400
+
+            # ===== Filtros (sin filtros se elimina toda la tabla)
+            where_clauses, params = sql_filters(filters) if filters else ([], [])
+            where_clause = f" WHERE {' AND '.join(where_clauses)}" if where_clauses else ""
+
+            # ===== Purga grande por lotes, con progreso en NDJSON
+            if mode == "chunked":
+                return self.__chunked_delete(table_name, where_clause, params, batch_size)
+
+            # ===== TRUNCATE: vacía la tabla sin recorrerla ni generar una fila muerta por registro
+            if mode == "truncate":
+                with closing(self.get_connection()) as conn:
+                    with conn.cursor() as cursor:
+                        cursor.execute(f"TRUNCATE {table_name}")
+                        rollups.refresh(cursor, table_name)
+                        versions.bump_postgres(cursor, table_name)
+                    conn.commit()
+                notify_write("postgresql", table_name)
+                return {
+                    "status": "deleted",
+                    "database": "postgresql",
+                    "table": table_name,
+                    "action": "truncated",
+                    "info": f"Se vació la tabla '{table_name}'"
+                }, 200
+
+            delete_query = f"DELETE FROM {table_name}{where_clause}"
 
             # ===== Ejecutar consulta
             with closing(self.get_connection()) as conn:
                 with conn.cursor() as cursor:
                     cursor.execute(delete_query, params)
                     affected_rows = cursor.rowcount
+                    if affected_rows:
+                        rollups.refresh(cursor, table_name)
+                        versions.bump_postgres(cursor, table_name)
                 conn.commit()
             
             if affected_rows == 0:
@@ -480,6 +1289,7 @@ class PostgresTables(Resource):
                     "status": "error",
                     "info": "No se encontraron registros para eliminar"
                 }, 404
+            notify_write("postgresql", table_name)
 
             return {
                 "status": "deleted",
@@ -489,9 +1299,12 @@ class PostgresTables(Resource):
                 "deleted_count": affected_rows
             }, 200
 
+        except FilterError as ex:
+            return {"status": "error", "info": str(ex)}, 400
+
         # ===== Manejo de errores
         except Exception:
             return {
                 "status": "error", 
                 "info": traceback.format_exc().splitlines()
-            }, 500
\ No newline at end of file
+            }, 500
@@ -0,0 +1,154 @@
+import hashlib, threading
+from contextlib import closing
+from functools import wraps
+from flask import current_app, request, g, has_request_context, Response
+from pymongo import ReturnDocument
+from .hooks import notify_write
+from .compression import etag_variants
+
+# ===== Contadores de escrituras por tabla/colección, compartidos por todos los workers.
+# Cada POST/PATCH/DELETE de la API incrementa el de su tabla (en PostgreSQL dentro de la
+# misma transacción), así la versión de una respuesta se calcula sin tocar los datos.
+POSTGRES_VERSIONS_TABLE = "api_write_versions"
+MONGO_VERSIONS_COLLECTION = "_api_versions"
+
+_LOCK_KEY = 7310002
+
+# ===== Última versión vista por este proceso, para detectar escrituras de otros workers
+_seen = {}
+_seen_lock = threading.Lock()
+_table_ready = False
+
+
+# =============== CONTADORES ===============
+def bump_postgres(cursor, table_name):
+    """Incrementa la versión de 'table_name' dentro de la transacción del cursor"""
+    global _table_ready
+    if not _table_ready:
+        # === Solo se marca lista cuando ya existe confirmada (la creación podría revertirse)
+        cursor.execute("SELECT to_regclass(%s) IS NOT NULL", (POSTGRES_VERSIONS_TABLE,))
+        if cursor.fetchone()[0]:
+            _table_ready = True
+        else:
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", (_LOCK_KEY,))
+            cursor.execute(f"""
+                CREATE TABLE IF NOT EXISTS {POSTGRES_VERSIONS_TABLE} (
+                    name TEXT PRIMARY KEY,
+                    version BIGINT NOT NULL
+                )
+            """)
+
+    cursor.execute(f"""
+        INSERT INTO {POSTGRES_VERSIONS_TABLE} (name, version) VALUES (%s, 1)
+        ON CONFLICT (name) DO UPDATE SET version = {POSTGRES_VERSIONS_TABLE}.version + 1
+        RETURNING version
+    """, (table_name,))
+    _remember({("postgresql", table_name): cursor.fetchone()[0]})
+
+
+def bump_mongo(db, collection_name):
+    """Incrementa la versión de 'collection_name' (operación atómica $inc)"""
+    document = db[MONGO_VERSIONS_COLLECTION].find_one_and_update(
+        {"_id": collection_name},
+        {"$inc": {"version": 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    _remember({("mongodb", collection_name): document["version"]})
+
+
+def _remember(versions):
+    with _seen_lock:
+        _seen.update(versions)
+
+
+def current_versions(get_connection, db, dependencies):
+    """
+    Versión actual de cada dependencia (0 si nunca se ha escrito por la API)
+
+    Args:
+        get_connection (callable): Conexión de PostgreSQL
+        db: Base de datos de MongoDB
+        dependencies (list): [(backend, nombre), ...]
+
+    Returns:
+        dict: {(backend, nombre): version}
+    """
+    versions = {dependency: 0 for dependency in dependencies}
+
+    tables = [name for backend, name in dependencies if backend == "postgresql"]
+    if tables:
+        with closing(get_connection()) as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT to_regclass(%s) IS NOT NULL", (POSTGRES_VERSIONS_TABLE,))
+                if cursor.fetchone()[0]:
+                    cursor.execute(
+                        f"SELECT name, version FROM {POSTGRES_VERSIONS_TABLE} WHERE name IN %s",
+                        (tuple(tables),)
+                    )
+                    for name, version in cursor.fetchall():
+                        versions[("postgresql", name)] = version
+
+    collections = [name for backend, name in dependencies if backend == "mongodb"]
+    if collections:
+        for document in db[MONGO_VERSIONS_COLLECTION].find({"_id": {"$in": collections}}):
+            versions[("mongodb", document["_id"])] = document["version"]
+
+    _observe(versions)
+    return versions
+
+
+def _observe(versions):
+    """
+    Si otra instancia escribió desde la última vez que este proceso vio la versión,
+    se avisa a los listeners locales para que descarten sus cachés de esa tabla
+    """
+    with _seen_lock:
+        changed = [
+            dependency for dependency, version in versions.items()
+            if dependency in _seen and _seen[dependency] != version
+        ]
+        _seen.update(versions)
+
+    for backend, name in changed:
+        notify_write(backend, name)
+
+
+# =============== ETAG ===============
+def conditional_response(dependencies):
+    """
+    Decorador para el GET de un Resource: responde con un ETag fuerte calculado
+    de las versiones de las tablas/colecciones de las que depende y regresa
+    304 Not Modified, sin ejecutar el método, si el cliente ya tiene esa versión.
+    Debe ir por fuera de @cached_response (la versión también forma parte de la llave).
+
+    Args:
+        dependencies (list): [(backend, nombre), ...]
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if args or kwargs or not has_request_context():
+                return method(self, *args, **kwargs)
+
+            versions = current_versions(
+                current_app.config["get_postgres_connection"], current_app.config["mongo_db"], dependencies
+            )
+            signature = request.path + "?" + "&".join(
+                f"{k}={v}" for k in sorted(request.args) for v in request.args.getlist(k)
+            ) + "|" + "|".join(f"{backend}:{name}:{versions[(backend, name)]}" for backend, name in dependencies)
+            etag = hashlib.sha1(signature.encode()).hexdigest()
+            g.etag = etag
+
+            # === no-cache: el navegador guarda la respuesta pero siempre revalida con el ETag
+            headers = {"ETag": f'"{etag}"', "Cache-Control": "no-cache"}
+            # === El cliente puede mandar el ETag con el sufijo de la codificación (ej. '-gzip')
+            if any(request.if_none_match.contains(variant) for variant in etag_variants(etag)):
+                return Response(status=304, headers=headers)
+
+            value = method(self)
+            if isinstance(value, tuple) and len(value) == 2 and value[1] == 200:
+                return value[0], 200, headers
+            return value
+        return wrapper
+    return decorator
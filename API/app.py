@@ -6,6 +6,10 @@ from flask_restful import Api
 from pymongo import MongoClient
 import psycopg2
 
+from Endpoints.Utils.pool import PostgresPool
+from Endpoints.Utils.encoder import output_json
+from Endpoints.Utils.compression import compress_response
+
 # ===== Cargar variables de entorno
 load_dotenv('../.env')
 
@@ -18,7 +22,7 @@ def get_mongo_client():
         authSource=os.getenv("MONGO_DB")
     )
 
-def get_postgres_connection():
+def connect_postgres():
     return psycopg2.connect(
         host=os.getenv('POSTGRES_HOST'),
         port=os.getenv('POSTGRES_PORT'),
@@ -27,6 +31,19 @@ def get_postgres_connection():
         password=os.getenv('POSTGRES_PASSWORD')
     )
 
+# ===== Pool de conexiones PostgreSQL (uno por proceso/worker)
+postgres_pool = PostgresPool(
+    connect      = connect_postgres,
+    minconn      = int(os.getenv('POSTGRES_POOL_MIN', 2)),
+    maxconn      = int(os.getenv('POSTGRES_POOL_MAX', 10)),
+    timeout      = float(os.getenv('POSTGRES_POOL_TIMEOUT', 30)),
+    health_check = os.getenv('POSTGRES_POOL_HEALTHCHECK', 'true').lower() == 'true',
+    idle_timeout = float(os.getenv('POSTGRES_POOL_IDLE_TIMEOUT', 300))
+)
+
+def get_postgres_connection():
+    return postgres_pool.get_connection()
+
 mongo_client = get_mongo_client()
 mongo_db = mongo_client[str(os.getenv('MONGO_DB'))]
 
@@ -35,9 +52,12 @@ mongo_db = mongo_client[str(os.getenv('MONGO_DB'))]
 app = Flask(__name__)
 app.config['mongo_db'] = mongo_db
 app.config['get_postgres_connection'] = get_postgres_connection
+app.config['postgres_pool'] = postgres_pool
 CORS(app)
 # api = Api(app, prefix='/api') # dev
 api = Api(app) # main
+api.representations['application/json'] = output_json # encoder rápido (orjson) para todas las respuestas
+app.after_request(compress_response) # gzip/br/zstd negociado con Accept-Encoding
 
 
 # ===== Registrar endpoints
@@ -45,10 +65,15 @@ api = Api(app) # main
 from Endpoints.Utils.collections import MongoCollections
 from Endpoints.Utils.tables import PostgresTables
 from Endpoints.Utils.info import Info
+from Endpoints.Utils.aggregations import PostgresAggregations, MongoAggregations
+from Endpoints.Utils.indexes import Indexes
 
-api.add_resource(Info,             '/info')
-api.add_resource(MongoCollections, '/mongo')
-api.add_resource(PostgresTables,   '/postgres')
+api.add_resource(Info,                 '/info')
+api.add_resource(MongoCollections,     '/mongo')
+api.add_resource(PostgresTables,       '/postgres')
+api.add_resource(PostgresAggregations, '/postgres/aggregate')
+api.add_resource(MongoAggregations,    '/mongo/aggregate')
+api.add_resource(Indexes,              '/indexes')
 
 # === Unidad 1
 from Endpoints.Unit1.portfolio import Portfolio_1
@@ -72,6 +97,20 @@ api.add_resource(Portfolio_3,    '/unit-3/portfolio')
 api.add_resource(Proyecto_3,    '/unit-3/project')
 
 
+# ===== Comandos de mantenimiento (flask --app app <comando>)
+@app.cli.command('rebuild-rollups')
+def rebuild_rollups():
+    """Reconstruye desde cero las tablas resumen (rollups) de los dashboards"""
+    from contextlib import closing
+    from Endpoints.Utils import rollups
+
+    with closing(get_postgres_connection()) as conn:
+        with conn.cursor() as cursor:
+            names = rollups.rebuild(cursor)
+        conn.commit()
+    print(f"Rollups reconstruidos: {', '.join(names)}")
+
+
 if __name__ == '__main__':
     print("=== FLASK INICIADO CORRECTAMENTE ===")
     print("Accede a estas URLs en POSTMAN:")